@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Parallel batch map generation into a single compact archive.
+
+Usage:
+    python batch_generate.py levels.pmza --seeds 1-10000 --width 100 --height 100
+
+Every map is generated from random.Random(seed) inside a worker process, so
+the archive contents do not depend on scheduling order and any map can be
+regenerated with create_map(..., seed=seed).
+
+Archive layout (little endian):
+    header   b'PMZA', uint32 version
+    records  one per map, in completion order:
+             int64 seed, uint32 width, uint32 height, uint32 room count,
+             room table (int32 x1, y1, x2, y2 per room),
+             grid packed at 2 bits per cell, 4 cells per byte, row-major
+    index    int64 seed, uint64 record offset per map, sorted by seed
+    footer   uint64 index offset, uint64 index entry count, b'PMZI'
+"""
+import argparse
+import bisect
+import multiprocessing
+import random
+import re
+import struct
+import sys
+import time
+
+import numpy as np
+
+import nethack_map_generator
+
+ARCHIVE_MAGIC = b'PMZA'
+INDEX_MAGIC = b'PMZI'
+ARCHIVE_VERSION = 1
+_HEADER = struct.Struct('<4sI')
+_RECORD = struct.Struct('<qIII')
+_INDEX_ENTRY = struct.Struct('<qQ')
+_FOOTER = struct.Struct('<QQ4s')
+
+# 2-bit code for each cell type, and the inverse lookup for unpacking.
+_CELL_TO_CODE = np.zeros(256, dtype=np.uint8)
+_CELL_TO_CODE[nethack_map_generator.FLOOR] = 1
+_CELL_TO_CODE[nethack_map_generator.EXIT] = 2
+_CELL_TO_CODE[nethack_map_generator.BLACK] = 3
+_CODE_TO_CELL = np.array([nethack_map_generator.WALL, nethack_map_generator.FLOOR,
+                          nethack_map_generator.EXIT, nethack_map_generator.BLACK], dtype=np.uint8)
+
+def pack_grid(grid):
+    """Packs a uint8 cell-code grid into 2 bits per cell."""
+    codes = _CELL_TO_CODE[grid.ravel()]
+    pad = (-len(codes)) % 4
+    if pad:
+        codes = np.concatenate([codes, np.zeros(pad, dtype=np.uint8)])
+    codes = codes.reshape(-1, 4)
+    return (codes[:, 0] << 6 | codes[:, 1] << 4 | codes[:, 2] << 2 | codes[:, 3]).astype(np.uint8).tobytes()
+
+def unpack_grid(data, width, height):
+    """Inverse of pack_grid: returns a (height, width) uint8 cell-code grid."""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.stack([packed >> 6, (packed >> 4) & 3, (packed >> 2) & 3, packed & 3], axis=1).ravel()
+    return _CODE_TO_CELL[codes[:width * height]].reshape(height, width)
+
+def _generate(job):
+    # Runs in a worker process; all randomness comes from the job's own seed.
+    seed, width, height, max_rooms, room_min_size, room_max_size = job
+    grid, rooms = nethack_map_generator.create_map(
+        width, height, max_rooms, room_min_size, room_max_size,
+        return_array=True, rng=random.Random(seed))
+    room_table = np.array([(r.x1, r.y1, r.x2, r.y2) for r in rooms], dtype='<i4').tobytes()
+    return seed, width, height, len(rooms), room_table, pack_grid(grid)
+
+class MapArchiveWriter:
+    """Streams generated maps into an archive; the seed index is written on close()."""
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION))
+        self.index = []
+
+    def write(self, seed, width, height, room_count, room_table, packed_grid):
+        self.index.append((seed, self.file.tell()))
+        self.file.write(_RECORD.pack(seed, width, height, room_count))
+        self.file.write(room_table)
+        self.file.write(packed_grid)
+
+    def close(self):
+        self.index.sort()
+        index_offset = self.file.tell()
+        for seed, offset in self.index:
+            self.file.write(_INDEX_ENTRY.pack(seed, offset))
+        self.file.write(_FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class MapArchiveReader:
+    """Random access to an archive by seed."""
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        magic, version = _HEADER.unpack(self.file.read(_HEADER.size))
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError(f"{path} is not a version {ARCHIVE_VERSION} map archive")
+        self.file.seek(-_FOOTER.size, 2)
+        index_offset, count, magic = _FOOTER.unpack(self.file.read(_FOOTER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} has no index (was the writer closed?)")
+        self.file.seek(index_offset)
+        entries = np.frombuffer(self.file.read(count * _INDEX_ENTRY.size),
+                                dtype=np.dtype([('seed', '<i8'), ('offset', '<u8')]))
+        self.seeds = entries['seed'].tolist()
+        self.offsets = entries['offset'].tolist()
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def __contains__(self, seed):
+        i = bisect.bisect_left(self.seeds, seed)
+        return i < len(self.seeds) and self.seeds[i] == seed
+
+    def load(self, seed, as_array=False):
+        """Returns (maze, rooms) for a seed; maze is a uint8 grid if as_array is set."""
+        i = bisect.bisect_left(self.seeds, seed)
+        if i == len(self.seeds) or self.seeds[i] != seed:
+            raise KeyError(seed)
+        self.file.seek(self.offsets[i])
+        _, width, height, room_count = _RECORD.unpack(self.file.read(_RECORD.size))
+        table = np.frombuffer(self.file.read(room_count * 16), dtype='<i4').reshape(-1, 4)
+        grid = unpack_grid(self.file.read((width * height + 3) // 4), width, height)
+        rooms = [nethack_map_generator.Rect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+                 for x1, y1, x2, y2 in table]
+        if as_array:
+            return grid, rooms
+        return nethack_map_generator.array_to_maze(grid), rooms
+
+    def close(self):
+        self.file.close()
+
+def parse_seeds(text):
+    """Parses '1-100,200,300-310' into a list of seeds."""
+    seeds = []
+    for part in text.split(','):
+        match = re.fullmatch(r'\s*(-?\d+)\s*(?:-\s*(-?\d+)\s*)?', part)
+        if match is None:
+            raise ValueError(f"bad seed range: {part!r}")
+        lo = int(match.group(1))
+        hi = int(match.group(2)) if match.group(2) is not None else lo
+        seeds.extend(range(lo, hi + 1))
+    return seeds
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate many maps in parallel into one archive.")
+    parser.add_argument("output", help="archive file to write")
+    parser.add_argument("--seeds", default="1-1000", help="seed list, e.g. 1-1000,2000")
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--height", type=int, default=100)
+    parser.add_argument("--max-rooms", type=int, default=40)
+    parser.add_argument("--room-min-size", type=int, default=3)
+    parser.add_argument("--room-max-size", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="seeds handed to a worker at a time")
+    args = parser.parse_args(argv)
+
+    jobs = [(seed, args.width, args.height, args.max_rooms, args.room_min_size, args.room_max_size)
+            for seed in dict.fromkeys(parse_seeds(args.seeds))]
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool, MapArchiveWriter(args.output) as writer:
+        for result in pool.imap_unordered(_generate, jobs, chunksize=args.chunksize):
+            writer.write(*result)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {len(jobs)} maps to {args.output} in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
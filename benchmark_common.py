@@ -0,0 +1,58 @@
+"""
+Result handling shared by the benchmark suites (benchmark_generator,
+benchmark_pathfinding): the common command line options, the run metadata,
+writing the JSON and the --compare regression check.
+"""
+import json
+import platform
+import sys
+import time
+
+def add_arguments(parser):
+    """Adds --output, --compare and --threshold to an argparse parser."""
+    parser.add_argument("--output", help="write results to this JSON file (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON result to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown for --compare")
+
+def run_info():
+    """Where and when the benchmark ran, for the top of the results."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def compare(results, baseline_path, threshold, metric, describe):
+    """
+    Prints cases whose `metric` got slower than in the baseline file by more
+    than threshold; describe(value) formats a metric value for the report.
+    Returns the number of regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = {case['name']: case for case in json.load(f)['cases']}
+    regressions = 0
+    for case in results['cases']:
+        old = baseline.get(case['name'])
+        if old is None:
+            continue
+        ratio = case[metric] / old[metric] if old[metric] else 1.0
+        if ratio > 1.0 + threshold:
+            regressions += 1
+            print(f"REGRESSION {case['name']}: {describe(old[metric])} -> "
+                  f"{describe(case[metric])} ({ratio:.2f}x)", file=sys.stderr)
+    return regressions
+
+def finish(results, args, metric, describe):
+    """
+    Writes results as JSON to args.output (or stdout) and, with args.compare,
+    checks them against that file. Returns the process exit status.
+    """
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold, metric, describe) else 0
+    return 0
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for nethack_map_generator.create_map.
+
+Times map generation over a matrix of map sizes, max_rooms values and room size
+ranges, in both the list and the array mode, and writes the results as JSON.
+
+Usage:
+    python benchmark_generator.py --output bench.json
+    python benchmark_generator.py --quick --compare bench.json
+
+Every case reports the median and best wall time over --repeat runs, the median
+of each phase reported by create_map(timings=...) (placement, exit, carving,
+walls), and the peak traced memory of one extra run under tracemalloc (kept
+separate so tracing does not skew the timings). Runs use fixed seeds, so
+successive results are comparable. --compare flags cases whose median got
+slower than a previous result file by more than --threshold.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import benchmark_common
+import nethack_map_generator
+
+SIZES = [100, 500, 2000]
+# max_rooms per size: sparse, typical and crowded placement.
+ROOM_COUNTS = {100: [10, 40, 200], 500: [100, 1000, 5000], 2000: [1000, 10000, 50000]}
+ROOM_SIZE_RANGES = [(3, 7), (5, 15)]
+QUICK_SIZES = [100, 500]
+PHASES = ['placement', 'exit', 'carving', 'walls']
+
+def run_case(size, max_rooms, room_min_size, room_max_size, array_mode, repeat, seed):
+    totals = []
+    phases = {phase: [] for phase in PHASES}
+    room_counts = []
+    for i in range(repeat):
+        timings = {}
+        start = time.perf_counter()
+        _, rooms = nethack_map_generator.create_map(
+            size, size, max_rooms, room_min_size, room_max_size,
+            array_mode=array_mode, rng=random.Random(seed + i), timings=timings)
+        totals.append(time.perf_counter() - start)
+        room_counts.append(len(rooms))
+        for phase in PHASES:
+            phases[phase].append(timings[phase])
+
+    tracemalloc.start()
+    nethack_map_generator.create_map(size, size, max_rooms, room_min_size, room_max_size,
+                                     array_mode=array_mode, rng=random.Random(seed))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': f"{size}x{size} rooms={max_rooms} size={room_min_size}-{room_max_size} "
+                f"{'array' if array_mode else 'list'}",
+        'width': size,
+        'height': size,
+        'max_rooms': max_rooms,
+        'room_min_size': room_min_size,
+        'room_max_size': room_max_size,
+        'mode': 'array' if array_mode else 'list',
+        'repeat': repeat,
+        'rooms_placed': statistics.median(room_counts),
+        'wall_time_median': statistics.median(totals),
+        'wall_time_min': min(totals),
+        'phases_median': {phase: statistics.median(values) for phase, values in phases.items()},
+        'peak_memory_bytes': peak,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark create_map over sizes and room densities.")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first run in each case")
+    parser.add_argument("--quick", action="store_true", help="skip the 2000x2000 cases")
+    parser.add_argument("--mode", choices=["list", "array", "both"], default="both")
+    benchmark_common.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    modes = {'list': [False], 'array': [True], 'both': [False, True]}[args.mode]
+    cases = []
+    for size in (QUICK_SIZES if args.quick else SIZES):
+        for max_rooms in ROOM_COUNTS[size]:
+            for room_min_size, room_max_size in ROOM_SIZE_RANGES:
+                for array_mode in modes:
+                    case = run_case(size, max_rooms, room_min_size, room_max_size,
+                                    array_mode, args.repeat, args.seed)
+                    print(f"{case['name']}: {case['wall_time_median']:.4f}s "
+                          + " ".join(f"{p}={t:.4f}" for p, t in case['phases_median'].items())
+                          + f" peak={case['peak_memory_bytes'] / 1e6:.1f}MB", file=sys.stderr)
+                    cases.append(case)
+
+    results = {
+        'generator_version': nethack_map_generator.GENERATOR_VERSION,
+        **benchmark_common.run_info(),
+        'cases': cases,
+    }
+    return benchmark_common.finish(results, args, 'wall_time_median', lambda t: f"{t:.4f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the bot_pathfinding algorithms.
+
+Generates maps with nethack_map_generator.create_map at several sizes and
+seeds, runs every algorithm from many random start cells (cells that can
+reach the exit) and writes the results as JSON.
+
+Usage:
+    python benchmark_pathfinding.py --output paths.json
+    python benchmark_pathfinding.py --quick --compare paths.json
+
+Every case (size x algorithm, over all seeds and starts) reports:
+    latency percentiles of the plain search (p50, p90, p99, max, in seconds),
+    nodes expanded, frontier pushes, came_from entries and peak frontier size
+    from a second run with a bot_pathfinding.SearchStats collector (kept
+    separate so counting does not skew the timings), path length, the time
+    the game's bot would take to walk the path facing heading 0, the peak
+    traced memory of one run per map under tracemalloc, and the one-off
+    per-maze setup the algorithm needs (jump table, room graph, room distance
+    matrix), timed on its first call.
+    index_build times the shared MazeIndex plus its exit distance field.
+--compare flags cases whose median latency got slower than a previous result
+file by more than --threshold.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import benchmark_common
+import bot_pathfinding
+import nethack_map_generator
+
+SIZES = [100, 300, 1000]
+QUICK_SIZES = [100, 300]
+ALGORITHMS = ["bfs", "dfs", "astar", "explore", "field", "jps", "hpa", "bibfs", "biastar", "dstar", "timed"]
+# EXPLORE tours every room (size^2 / 250 of them), which is impractical to
+# benchmark from many starts on the largest maps.
+EXPLORE_MAX_SIZE = 300
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list, q in [0, 100]."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+def run_map(size, seed, algorithms, starts_per_map):
+    """Runs every algorithm on one generated map; returns {algorithm: raw samples}."""
+    maze, rooms = nethack_map_generator.create_map(size, size, size * size // 250, 3, 8,
+                                                   rng=random.Random(seed))
+    # The exit distance field is needed to pick start cells, so it is timed
+    # with the index rather than as FIELD's setup.
+    start = time.perf_counter()
+    index = bot_pathfinding.MazeIndex(maze)
+    index.exit_distances()
+    index_time = time.perf_counter() - start
+    starts = index.reachable_cells(starts_per_map, random.Random(seed))
+    samples = {}
+    for algorithm in algorithms:
+        if not starts:
+            continue
+        # The first call builds whatever the algorithm caches on the index.
+        start = time.perf_counter()
+        bot_pathfinding.find_exit(algorithm, bot_pathfinding.CellPosition(starts[0]), maze, rooms, index, heading=0)
+        setup = time.perf_counter() - start
+
+        tracemalloc.start()
+        bot_pathfinding.find_exit(algorithm, bot_pathfinding.CellPosition(starts[0]), maze, rooms, index, heading=0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {'latency': [], 'expansions': [], 'pushes': [], 'came_from': [],
+                  'max_frontier': [], 'path_length': [], 'episode_time': [],
+                  'found': 0, 'setup': setup, 'index_build': index_time, 'peak_memory': peak}
+        for cell in starts:
+            position = bot_pathfinding.CellPosition(cell)
+            start = time.perf_counter()
+            path = bot_pathfinding.find_exit(algorithm, position, maze, rooms, index, heading=0)
+            result['latency'].append(time.perf_counter() - start)
+            stats = bot_pathfinding.SearchStats()
+            commands = bot_pathfinding.find_exit_commands(algorithm, position, 0, maze, rooms, index, stats=stats)
+            result['expansions'].append(stats.expansions)
+            result['pushes'].append(stats.pushes)
+            result['came_from'].append(stats.came_from)
+            result['max_frontier'].append(stats.max_frontier)
+            if path:
+                result['found'] += 1
+                result['path_length'].append(len(path) - 1)
+                result['episode_time'].append(bot_pathfinding.episode_time(commands))
+        samples[algorithm] = result
+    return samples
+
+def summarize(size, algorithm, results):
+    latency = [t for r in results for t in r['latency']]
+    lengths = [n for r in results for n in r['path_length']]
+    episodes = [t for r in results for t in r['episode_time']]
+    expansions = [n for r in results for n in r['expansions']]
+    frontier = [n for r in results for n in r['max_frontier']]
+    pushes = [n for r in results for n in r['pushes']]
+    came_from = [n for r in results for n in r['came_from']]
+    return {
+        'name': f"{size}x{size} {algorithm}",
+        'size': size,
+        'algorithm': algorithm,
+        'maps': len(results),
+        'searches': len(latency),
+        'found': sum(r['found'] for r in results),
+        'latency_p50': percentile(latency, 50),
+        'latency_p90': percentile(latency, 90),
+        'latency_p99': percentile(latency, 99),
+        'latency_max': max(latency),
+        'latency_mean': statistics.mean(latency),
+        'expansions_median': statistics.median(expansions),
+        'expansions_mean': statistics.mean(expansions),
+        'pushes_median': statistics.median(pushes),
+        'came_from_median': statistics.median(came_from),
+        'max_frontier_median': statistics.median(frontier),
+        'max_frontier_max': max(frontier),
+        'path_length_mean': statistics.mean(lengths) if lengths else None,
+        'path_length_max': max(lengths) if lengths else None,
+        'episode_time_mean': statistics.mean(episodes) if episodes else None,
+        'peak_memory_bytes': max(r['peak_memory'] for r in results),
+        'setup_median': statistics.median(r['setup'] for r in results),
+        'index_build_median': statistics.median(r['index_build'] for r in results),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot pathfinding algorithms on generated maps.")
+    parser.add_argument("--seeds", type=int, default=3, help="maps per size")
+    parser.add_argument("--starts", type=int, default=20, help="start cells per map")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first map of each size")
+    parser.add_argument("--quick", action="store_true", help="skip the 1000x1000 maps")
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS), help="comma separated subset")
+    benchmark_common.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    algorithms = [a for a in args.algorithms.split(',') if a]
+    cases = []
+    for size in (QUICK_SIZES if args.quick else SIZES):
+        selected = [a for a in algorithms if a != "explore" or size <= EXPLORE_MAX_SIZE]
+        per_algorithm = {algorithm: [] for algorithm in selected}
+        for seed in range(args.seed, args.seed + args.seeds):
+            for algorithm, result in run_map(size, seed, selected, args.starts).items():
+                per_algorithm[algorithm].append(result)
+        for algorithm in selected:
+            if not per_algorithm[algorithm]:
+                continue
+            case = summarize(size, algorithm, per_algorithm[algorithm])
+            print(f"{case['name']}: p50={case['latency_p50'] * 1000:.3f}ms "
+                  f"p99={case['latency_p99'] * 1000:.3f}ms expanded={case['expansions_median']:.0f} "
+                  f"frontier={case['max_frontier_median']:.0f} length={case['path_length_mean']} "
+                  f"episode={case['episode_time_mean'] or 0:.2f}s "
+                  f"setup={case['setup_median'] * 1000:.1f}ms "
+                  f"peak={case['peak_memory_bytes'] / 1e6:.2f}MB", file=sys.stderr)
+            cases.append(case)
+
+    results = {**benchmark_common.run_info(), 'cases': cases}
+    return benchmark_common.finish(results, args, 'latency_p50', lambda t: f"{t * 1000:.3f}ms")
+
+if __name__ == "__main__":
+    sys.exit(main())
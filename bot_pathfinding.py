@@ -1,5 +1,313 @@
-from collections import deque
+from array import array
+from collections import OrderedDict, deque
+import hashlib
 import heapq
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for wavefront_distances.
+    np = None
+
+# Cells the per-maze builds (JumpTable, RoomGraph, room_distance_matrix) work
+# through between two SearchStats.checkpoint() calls.
+CHECKPOINT_CELLS = 4096
+
+class MazeIndex:
+    """
+    Per-maze data shared by all searches, built once in O(W*H):
+    - exit_cell: the (x, y) of 'E', or None.
+    - passable: flat bytearray, 1 for floor (' ') and exit ('E') cells.
+    - neighbor_table: for every flat cell id, a tuple of the passable neighbour ids
+      in the same order neighbors() returns them.
+    Flat cell ids are column-major (id = x * rows + y), so ids sort exactly like
+    (x, y) tuples and tie-breaking in the heap-based searches is unchanged.
+    With lazy=True nothing is scanned up front: neighbour tuples are worked out
+    the first time a search asks for a cell and passable is built on first
+    access, so a one-off search pays only for the cells it touches.
+    """
+    def __init__(self, maze, lazy=False):
+        self.maze = maze
+        rows = len(maze)
+        cols = len(maze[0])
+        self.rows = rows
+        self.cols = cols
+        self._exit_distances = None
+        self.jump_table = None  # JumpTable, built by the first find_exit_jps call
+        self.room_graph = None  # RoomGraph, built by the first find_exit_hpa call
+        self.room_distance_cache = None  # (centers, matrix) from room_distance_matrix
+        self.padded_passable = None  # NumPy mask used by wavefront_distances
+        self._fingerprint = None
+        if lazy:
+            # First 'E' in column-major order, like the columns.find below.
+            exit_cell = min(((row.find('E'), y) for y, row in enumerate(maze) if 'E' in row), default=None)
+            self.exit_id = self.cell_id(exit_cell) if exit_cell is not None else None
+            self.exit_cell = exit_cell
+            self.neighbor_table = _LazyNeighborTable(maze, rows, cols)
+            return
+        columns = ''.join(''.join(column) for column in zip(*maze))
+        self.passable = bytearray(1 if ch in (' ', 'E') else 0 for ch in columns)
+        exit_id = columns.find('E')
+        self.exit_id = exit_id if exit_id >= 0 else None
+        self.exit_cell = self.cell_at(exit_id) if exit_id >= 0 else None
+
+        passable = self.passable
+        empty = ()
+        table = [empty] * (rows * cols)
+        for cid in range(rows * cols):
+            x, y = divmod(cid, rows)
+            valid = []
+            # Same order as neighbors(): (x+1, y), (x-1, y), (x, y+1), (x, y-1).
+            if x + 1 < cols and passable[cid + rows]:
+                valid.append(cid + rows)
+            if x > 0 and passable[cid - rows]:
+                valid.append(cid - rows)
+            if y + 1 < rows and passable[cid + 1]:
+                valid.append(cid + 1)
+            if y > 0 and passable[cid - 1]:
+                valid.append(cid - 1)
+            if valid:
+                table[cid] = tuple(valid)
+        self.neighbor_table = table
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set yet: passable on a lazy index.
+        if name == 'passable':
+            columns = ''.join(''.join(column) for column in zip(*self.maze))
+            self.passable = bytearray(1 if ch in (' ', 'E') else 0 for ch in columns)
+            return self.passable
+        raise AttributeError(name)
+
+    def exit_distances(self):
+        """
+        Reverse-BFS distance (in steps) from every cell to the exit, as a flat
+        array('i') indexed by cell id; -1 marks cells that cannot reach it.
+        Walls get the distance through their best open neighbour plus one, so
+        the field can also steer a bot that ended up inside a wall cell.
+        Computed on first use and kept for the lifetime of the index.
+        """
+        if self._exit_distances is None:
+            dist = array('i', [-1]) * (self.rows * self.cols)
+            if self.exit_id is not None:
+                table = self.neighbor_table
+                passable = self.passable
+                dist[self.exit_id] = 0
+                queue = deque([self.exit_id])
+                while queue:
+                    current = queue.popleft()
+                    d = dist[current] + 1
+                    for n in table[current]:
+                        if dist[n] < 0:
+                            dist[n] = d
+                            queue.append(n)
+                # Blocked cells next to the reachable area (the grid graph is undirected,
+                # so only passable cells were reached above).
+                for cid in range(self.rows * self.cols):
+                    if passable[cid]:
+                        continue
+                    neighbours = table[cid]
+                    if neighbours:
+                        best = min((dist[n] for n in neighbours if dist[n] >= 0), default=-1)
+                        if best >= 0:
+                            dist[cid] = best + 1
+            self._exit_distances = dist
+        return self._exit_distances
+
+    def has_exit_distances(self):
+        """Whether exit_distances() is already computed (and so costs nothing)."""
+        return self._exit_distances is not None
+
+    def reachable_cells(self, count, rng):
+        """count distinct random open cells that can reach the exit (fewer if the maze is too small)."""
+        field = self.exit_distances()
+        passable = self.passable
+        candidates = [self.cell_at(cid) for cid in range(self.rows * self.cols)
+                      if passable[cid] and field[cid] > 0]
+        return rng.sample(candidates, min(count, len(candidates)))
+
+    def fingerprint(self):
+        """Digest of the maze contents, used to key cached paths (see PathCache)."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1('\n'.join(self.maze).encode('ascii')).hexdigest()
+        return self._fingerprint
+
+    def cell_id(self, cell):
+        return cell[0] * self.rows + cell[1]
+
+    def cell_at(self, cid):
+        return divmod(cid, self.rows)
+
+    def path_cells(self, came_from, goal_id):
+        """Rebuilds the (x, y) path ending at goal_id from a came_from dict of ids (start maps to None)."""
+        path = []
+        current = goal_id
+        rows = self.rows
+        while current is not None:
+            path.append(divmod(current, rows))
+            current = came_from[current]
+        path.reverse()
+        return path
+
+    def set_cells(self, changes):
+        """
+        Edits the maze in place, for dynamic maps: changes is an iterable of
+        ((x, y), ch) pairs. passable and the neighbour table are patched around
+        each edited cell; everything derived from the whole maze (exit
+        distances, jump table, room graph, ...) is dropped and rebuilt on next
+        use. Returns the ids of the cells that became passable or blocked, for
+        DStarLite.update.
+        """
+        maze = self.maze
+        rows = self.rows
+        passable = self.passable
+        changed = []
+        for (x, y), ch in changes:
+            row = maze[y]
+            maze[y] = row[:x] + ch + row[x + 1:]
+            cid = x * rows + y
+            if ch == 'E':
+                self.exit_id = cid
+                self.exit_cell = (x, y)
+            elif cid == self.exit_id:
+                self.exit_id = None
+                self.exit_cell = None
+            is_open = 1 if ch in (' ', 'E') else 0
+            if passable[cid] != is_open:
+                passable[cid] = is_open
+                changed.append(cid)
+        table = self.neighbor_table
+        for cid in changed:
+            for n in (cid,) + self._grid_neighbors(cid):
+                table[n] = tuple(m for m in self._grid_neighbors(n) if passable[m])
+        self._exit_distances = None
+        self.jump_table = None
+        self.room_graph = None
+        self.room_distance_cache = None
+        self.padded_passable = None
+        self._fingerprint = None
+        return changed
+
+    def _grid_neighbors(self, cid):
+        # In-bounds neighbour ids in neighbor_table order, passable or not.
+        rows = self.rows
+        x, y = divmod(cid, rows)
+        found = ()
+        if x + 1 < self.cols:
+            found += (cid + rows,)
+        if x > 0:
+            found += (cid - rows,)
+        if y + 1 < rows:
+            found += (cid + 1,)
+        if y > 0:
+            found += (cid - 1,)
+        return found
+
+class CellPosition:
+    """
+    Stand-in for the game's glm.vec3 player position (x = column, z = row),
+    placed at the centre of an (x, y) cell; for callers outside the game.
+    """
+    def __init__(self, cell):
+        self.x = cell[0] + 0.5
+        self.z = cell[1] + 0.5
+
+class SearchStats:
+    """
+    Optional collector for the searches below (pass it as stats=...).
+    expansions: cells (or abstract nodes) taken off a frontier.
+    pushes: entries added to a frontier.
+    max_frontier: largest size any single open list (queue, stack or heap) reached.
+    came_from: entries in the searches' came_from maps, summed over sub-searches.
+    find_exit and iter_exit_path also fill in the algorithm, the path length in
+    steps, the shortest possible length (from the exit distance field, -1 if the
+    exit is unreachable; with shortest=False only when the index already has
+    the field) and the wall time spent searching. episode_time is
+    filled in where the bot's starting heading is known (find_exit_timed,
+    find_exit_commands).
+    A search only routes its frontier operations through the collector when one
+    is given, so without it the plain code runs.
+    """
+    def __init__(self, shortest=True):
+        self.shortest = shortest  # Whether to build the exit distance field for shortest_length
+        self.algorithm = None
+        self.expansions = 0
+        self.pushes = 0
+        self.max_frontier = 0
+        self.came_from = 0
+        self.path_length = 0
+        self.shortest_length = -1
+        self.wall_time = 0.0
+        self.episode_time = None  # Seconds the game's bot needs to walk the path, when known
+
+    def checkpoint(self):
+        """
+        Called every CHECKPOINT_CELLS cells of a per-maze build, which counts no
+        expansions. Does nothing here; a subclass may raise to abandon the search.
+        """
+
+    def popper(self, pop):
+        def counted(*args):
+            self.expansions += 1
+            return pop(*args)
+        return counted
+
+    def pusher(self, push, frontier):
+        def counted(*args):
+            push(*args)
+            self.pushes += 1
+            if len(frontier) > self.max_frontier:
+                self.max_frontier = len(frontier)
+        return counted
+
+    def summary(self):
+        """The stats as two short lines of text, for logs and overlays."""
+        if self.shortest_length > 0:
+            detour = f" ({self.path_length / self.shortest_length:.1f}x shortest)"
+        else:
+            detour = ""
+        episode = f", episode {self.episode_time:.2f} s" if self.episode_time is not None else ""
+        return [f"{(self.algorithm or 'search').upper()}: {self.expansions} expanded, {self.pushes} pushed, "
+                f"frontier {self.max_frontier}, came_from {self.came_from}",
+                f"path {self.path_length} steps{detour}{episode}, {self.wall_time * 1000:.2f} ms"]
+
+def _frontier_ops(stats, pop, push, frontier):
+    # The pop/push pair a search should use on frontier: the plain functions,
+    # or counting wrappers when a SearchStats is collecting.
+    if stats is None:
+        return pop, push
+    return stats.popper(pop), stats.pusher(push, frontier)
+
+class _LazyNeighborTable(dict):
+    # neighbor_table of a lazy MazeIndex: a cell's tuple is read off the maze
+    # rows the first time it is looked up, then kept.
+    def __init__(self, maze, rows, cols):
+        super().__init__()
+        self.maze = maze
+        self.rows = rows
+        self.cols = cols
+
+    def __missing__(self, cid):
+        maze = self.maze
+        rows = self.rows
+        x, y = divmod(cid, rows)
+        valid = []
+        if x + 1 < self.cols and maze[y][x + 1] in (' ', 'E'):
+            valid.append(cid + rows)
+        if x > 0 and maze[y][x - 1] in (' ', 'E'):
+            valid.append(cid - rows)
+        if y + 1 < rows and maze[y + 1][x] in (' ', 'E'):
+            valid.append(cid + 1)
+        if y > 0 and maze[y - 1][x] in (' ', 'E'):
+            valid.append(cid - 1)
+        neighbours = tuple(valid)
+        self[cid] = neighbours
+        return neighbours
+
+def _index_for(maze, index):
+    # Searches accept a prebuilt MazeIndex. Without one they get a lazy index,
+    # which costs a scan of the rows for the exit plus the cells the search
+    # actually visits; a full MazeIndex would be O(W*H) work on every call.
+    return index if index is not None else MazeIndex(maze, lazy=True)
 
 def neighbors(cell, maze):
     # Only allow cells that are floor (' ') or the exit ('E').
@@ -14,135 +322,749 @@ def neighbors(cell, maze):
                 valid.append((nx, ny))
     return valid
 
-def bfs_path(start, goal, maze):
-    queue = deque([start])
-    came_from = {start: None}
+def _bfs_ids(index, start_id, goal_id, avoid_id=None, stats=None):
+    table = index.neighbor_table
+    queue = deque([start_id])
+    popleft, append = _frontier_ops(stats, queue.popleft, queue.append, queue)
+    came_from = {start_id: None}
+    path = []  # No path found
     while queue:
-        current = queue.popleft()
-        if current == goal:
-            path = []
-            while current is not None:
-                path.append(current)
-                current = came_from[current]
-            path.reverse()
-            return path
-        for n in neighbors(current, maze):
+        current = popleft()
+        if current == goal_id:
+            path = index.path_cells(came_from, current)
+            break
+        for n in table[current]:
+            if n == avoid_id:
+                continue
             if n not in came_from:
                 came_from[n] = current
-                queue.append(n)
-    return []  # No path found
+                append(n)
+    if stats is not None:
+        stats.came_from += len(came_from)
+    return path
+
+def bfs_path(start, goal, maze, index=None):
+    index = _index_for(maze, index)
+    return _bfs_ids(index, index.cell_id(start), index.cell_id(goal))
 
-def bfs_path_no_exit(start, goal, maze, exit_cell):
+def bfs_path_no_exit(start, goal, maze, exit_cell, index=None):
     """
     BFS that avoids passing through the exit cell if the goal is not the exit.
     """
-    queue = deque([start])
-    came_from = {start: None}
-    while queue:
-        current = queue.popleft()
-        if current == goal:
-            path = []
-            while current is not None:
-                path.append(current)
-                current = came_from[current]
-            path.reverse()
-            return path
-        for n in neighbors(current, maze):
-            if n == exit_cell and goal != exit_cell:
-                continue  # Skip the exit if not the target.
-            if n not in came_from:
-                came_from[n] = current
-                queue.append(n)
-    return []
+    index = _index_for(maze, index)
+    avoid_id = index.cell_id(exit_cell) if goal != exit_cell else None
+    return _bfs_ids(index, index.cell_id(start), index.cell_id(goal), avoid_id)
 
-def find_exit_bfs(player_pos, maze):
+def find_exit_bfs(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
     start = (int(player_pos.x), int(player_pos.z))
-    exit_cell = None
-    rows = len(maze)
-    cols = len(maze[0])
-    for y in range(rows):
-        for x in range(cols):
-            if maze[y][x] == "E":
-                exit_cell = (x, y)
-                break
-        if exit_cell is not None:
-            break
-    if exit_cell is None:
+    if index.exit_id is None:
         return []
-    return bfs_path(start, exit_cell, maze)
+    return _bfs_ids(index, index.cell_id(start), index.exit_id, stats=stats)
 
-def find_exit_dfs(player_pos, maze):
+def find_exit_dfs(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
     start = (int(player_pos.x), int(player_pos.z))
-    exit_cell = None
-    rows = len(maze)
-    cols = len(maze[0])
-    for y in range(rows):
-        for x in range(cols):
-            if maze[y][x] == "E":
-                exit_cell = (x, y)
-                break
-        if exit_cell is not None:
-            break
-    if exit_cell is None:
+    exit_id = index.exit_id
+    if exit_id is None:
         return []
-    stack = [start]
-    came_from = {start: None}
+    table = index.neighbor_table
+    start_id = index.cell_id(start)
+    stack = [start_id]
+    pop, append = _frontier_ops(stats, stack.pop, stack.append, stack)
+    came_from = {start_id: None}
+    path = []
     while stack:
-        current = stack.pop()
-        if current == exit_cell:
-            path = []
-            while current is not None:
-                path.append(current)
-                current = came_from[current]
-            path.reverse()
-            return path
-        for n in neighbors(current, maze):
+        current = pop()
+        if current == exit_id:
+            path = index.path_cells(came_from, current)
+            break
+        for n in table[current]:
             if n not in came_from:
                 came_from[n] = current
-                stack.append(n)
-    return []
+                append(n)
+    if stats is not None:
+        stats.came_from += len(came_from)
+    return path
 
 def heuristic(a, b):
     # Manhattan distance.
     return abs(a[0]-b[0]) + abs(a[1]-b[1])
 
-def find_exit_astar(player_pos, maze):
+def _astar_ids(index, start_id, goal_id, avoid_id=None, stats=None):
+    table = index.neighbor_table
+    rows = index.rows
+    goal_x, goal_y = divmod(goal_id, rows)
+    frontier = []
+    heappop, heappush = _frontier_ops(stats, heapq.heappop, heapq.heappush, frontier)
+    heappush(frontier, (0, start_id))
+    came_from = {start_id: None}
+    cost_so_far = {start_id: 0}
+    while frontier:
+        current_priority, current = heappop(frontier)
+        if current == goal_id:
+            break
+        new_cost = cost_so_far[current] + 1
+        for n in table[current]:
+            if n == avoid_id:
+                continue
+            if n not in cost_so_far or new_cost < cost_so_far[n]:
+                cost_so_far[n] = new_cost
+                nx, ny = divmod(n, rows)
+                priority = new_cost + abs(nx - goal_x) + abs(ny - goal_y)
+                heappush(frontier, (priority, n))
+                came_from[n] = current
+    if stats is not None:
+        stats.came_from += len(came_from)
+    if goal_id not in came_from:
+        return []
+    return index.path_cells(came_from, goal_id)
+
+def find_exit_astar(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
     start = (int(player_pos.x), int(player_pos.z))
-    exit_cell = None
-    rows = len(maze)
-    cols = len(maze[0])
-    for y in range(rows):
-        for x in range(cols):
-            if maze[y][x] == "E":
-                exit_cell = (x, y)
-                break
-        if exit_cell is not None:
+    if index.exit_id is None:
+        return []
+    return _astar_ids(index, index.cell_id(start), index.exit_id, stats=stats)
+
+def _joined_path(index, came_from, came_to, meet):
+    # Stitches a start -> meet path (from came_from) to a meet -> goal path
+    # (from came_to, whose links point towards the goal).
+    path = index.path_cells(came_from, meet)
+    current = came_to[meet]
+    while current is not None:
+        path.append(index.cell_at(current))
+        current = came_to[current]
+    return path
+
+def _bidirectional_bfs_ids(index, start_id, goal_id, stats=None):
+    """
+    BFS from both ends at once, one whole level of the smaller frontier at a
+    time. Each side only has to reach about half the distance, so on corridor
+    maps it expands roughly two disks of radius d/2 instead of one of radius d.
+    """
+    if start_id == goal_id:
+        return [index.cell_at(start_id)]
+    table = index.neighbor_table
+    came_from = {start_id: None}
+    came_to = {goal_id: None}
+    forward = [start_id]
+    backward = [goal_id]
+    meet = None
+    while forward and backward:
+        if len(forward) <= len(backward):
+            frontier, seen, other = forward, came_from, came_to
+        else:
+            frontier, seen, other = backward, came_to, came_from
+        next_level = []
+        if stats is not None:
+            stats.expansions += len(frontier)
+            stats.max_frontier = max(stats.max_frontier, len(frontier))
+        for current in frontier:
+            for n in table[current]:
+                if n not in seen:
+                    seen[n] = current
+                    next_level.append(n)
+                    if n in other and meet is None:
+                        # Every meeting found while expanding this level closes
+                        # a path of the same length, so the first one will do.
+                        meet = n
+        if stats is not None:
+            stats.pushes += len(next_level)
+        if meet is not None:
             break
-    if exit_cell is None:
+        if frontier is forward:
+            forward = next_level
+        else:
+            backward = next_level
+    if stats is not None:
+        stats.came_from += len(came_from) + len(came_to)
+    if meet is None:
+        return []  # No path found
+    return _joined_path(index, came_from, came_to, meet)
+
+def _bidirectional_astar_ids(index, start_id, goal_id, stats=None):
+    """
+    Bidirectional A*: a forward search towards the goal and a backward one
+    towards the start, each with its own Manhattan heuristic, always advancing
+    the side with the smaller open set. f = g + h never overestimates, so once
+    either side's smallest f reaches the best path found through a meeting
+    cell, no shorter path is left.
+    """
+    if start_id == goal_id:
+        return [index.cell_at(start_id)]
+    table = index.neighbor_table
+    rows = index.rows
+    start_x, start_y = divmod(start_id, rows)
+    goal_x, goal_y = divmod(goal_id, rows)
+    came_from = {start_id: None}
+    came_to = {goal_id: None}
+    cost_from = {start_id: 0}
+    cost_to = {goal_id: 0}
+    forward = [(abs(start_x - goal_x) + abs(start_y - goal_y), start_id)]
+    backward = [(forward[0][0], goal_id)]
+    forward_ops = _frontier_ops(stats, heapq.heappop, heapq.heappush, forward)
+    backward_ops = _frontier_ops(stats, heapq.heappop, heapq.heappush, backward)
+    best = None
+    meet = None
+    while forward and backward:
+        if best is not None and (forward[0][0] >= best or backward[0][0] >= best):
+            break
+        if len(forward) <= len(backward):
+            frontier, costs, links, other = forward, cost_from, came_from, cost_to
+            (heappop, heappush), target_x, target_y = forward_ops, goal_x, goal_y
+        else:
+            frontier, costs, links, other = backward, cost_to, came_to, cost_from
+            (heappop, heappush), target_x, target_y = backward_ops, start_x, start_y
+        priority, current = heappop(frontier)
+        new_cost = costs[current] + 1
+        for n in table[current]:
+            if n not in costs or new_cost < costs[n]:
+                costs[n] = new_cost
+                links[n] = current
+                nx, ny = divmod(n, rows)
+                heappush(frontier, (new_cost + abs(nx - target_x) + abs(ny - target_y), n))
+                if n in other and (best is None or new_cost + other[n] < best):
+                    best = new_cost + other[n]
+                    meet = n
+    if stats is not None:
+        stats.came_from += len(came_from) + len(came_to)
+    if meet is None:
         return []
-    frontier = []
-    heapq.heappush(frontier, (0, start))
+    return _joined_path(index, came_from, came_to, meet)
+
+def bidirectional_bfs_path(start, goal, maze, index=None):
+    index = _index_for(maze, index)
+    return _bidirectional_bfs_ids(index, index.cell_id(start), index.cell_id(goal))
+
+def find_exit_bibfs(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
+    start = (int(player_pos.x), int(player_pos.z))
+    if index.exit_id is None:
+        return []
+    return _bidirectional_bfs_ids(index, index.cell_id(start), index.exit_id, stats)
+
+def find_exit_biastar(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
+    start = (int(player_pos.x), int(player_pos.z))
+    if index.exit_id is None:
+        return []
+    return _bidirectional_astar_ids(index, index.cell_id(start), index.exit_id, stats)
+
+_INF = 1 << 30  # "No path" distance in DStarLite
+
+class DStarLite:
+    """
+    Incremental planner for dynamic maps (D* Lite, Koenig & Likhachev 2002).
+    It searches backwards from the exit and keeps its g / rhs distance
+    estimates between calls, so after cells are edited (MazeIndex.set_cells)
+    only the cells whose distance to the exit actually changed are searched
+    again, and moving the start along the path does not restart the search:
+
+        planner = DStarLite(index, (x, y))
+        path = planner.path()
+        planner.move_to(path[1])
+        planner.update(index.set_cells([((x2, y2), '#')]))
+        path = planner.path()
+
+    Paths are shortest paths. The exit is the one the index had when the
+    planner was made; create a new planner if it moves. A start inside a wall
+    is left through its open neighbours, like the BFS-based searches do, but
+    no path ever passes through one.
+    """
+    def __init__(self, index, start, stats=None):
+        self.index = index
+        self.goal_id = index.exit_id
+        self.start_id = index.cell_id(start)
+        self.start = tuple(start)
+        self.stats = stats
+        self.km = 0  # Heuristic drift from start moves, added to every new key
+        self.g = {}
+        self.rhs = {}
+        self.keys = {}  # Cell id -> key it is queued under; other heap entries are stale
+        self.queue = []
+        if stats is not None:
+            stats.algorithm = "dstar"
+        if self.goal_id is not None:
+            self.rhs[self.goal_id] = 0
+            self._push(self.goal_id)
+
+    def _key(self, cid):
+        d = min(self.g.get(cid, _INF), self.rhs.get(cid, _INF))
+        x, y = divmod(cid, self.index.rows)
+        sx, sy = self.start
+        return (d + abs(x - sx) + abs(y - sy) + self.km, d)
+
+    def _push(self, cid):
+        key = self._key(cid)
+        self.keys[cid] = key
+        heapq.heappush(self.queue, (key, cid))
+        stats = self.stats
+        if stats is not None:
+            stats.pushes += 1
+            stats.max_frontier = max(stats.max_frontier, len(self.keys))
+
+    def _update_vertex(self, cid):
+        g = self.g
+        if cid == self.goal_id:
+            self.rhs[cid] = 0 if self.index.passable[cid] else _INF
+        elif cid == self.start_id or self.index.passable[cid]:
+            best = min((g.get(n, _INF) for n in self.index.neighbor_table[cid]), default=_INF)
+            self.rhs[cid] = min(best + 1, _INF)
+        else:
+            self.rhs[cid] = _INF
+        if g.get(cid, _INF) != self.rhs[cid]:
+            self._push(cid)
+        else:
+            self.keys.pop(cid, None)
+
+    def _compute(self):
+        g = self.g
+        rhs = self.rhs
+        keys = self.keys
+        queue = self.queue
+        table = self.index.neighbor_table
+        rows = self.index.rows
+        goal = self.goal_id
+        stats = self.stats
+        heappop, heappush = heapq.heappop, heapq.heappush
+        started = time.perf_counter()
+        start = self.start_id
+        sx, sy = self.start
+        km = self.km
+        # A start inside a wall takes its distance from its open neighbours
+        # (sources), which do not list it in their own table entries.
+        blocked_start = start if not self.index.passable[start] else None
+        sources = table[start] if blocked_start is not None else ()
+        while queue:
+            k_old, u = queue[0]
+            if keys.get(u) != k_old:
+                heappop(queue)
+                continue
+            # The start's heuristic is 0, so its key is just (d + km, d).
+            g_start = g.get(start, _INF)
+            rhs_start = rhs.get(start, _INF)
+            d = min(g_start, rhs_start)
+            if k_old >= (d + km, d) and rhs_start == g_start:
+                break
+            heappop(queue)
+            if stats is not None:
+                stats.expansions += 1
+            g_u = g.get(u, _INF)
+            rhs_u = rhs[u]
+            d = min(g_u, rhs_u)
+            x, y = divmod(u, rows)
+            k_new = (d + abs(x - sx) + abs(y - sy) + km, d)
+            if k_old < k_new:
+                keys[u] = k_new
+                heappush(queue, (k_new, u))
+            elif g_u > rhs_u:
+                g[u] = rhs_u
+                del keys[u]
+                if u == blocked_start:
+                    continue
+                # u got cheaper, so it can only lower its neighbours' rhs.
+                through = rhs_u + 1
+                for n in table[u]:
+                    if n != goal and through < rhs.get(n, _INF):
+                        rhs[n] = through
+                        if g.get(n, _INF) != through:
+                            self._push(n)
+                        else:
+                            keys.pop(n, None)
+                if u in sources and through < rhs.get(start, _INF):
+                    rhs[start] = through
+                    if g.get(start, _INF) != through:
+                        self._push(start)
+                    else:
+                        keys.pop(start, None)
+            else:
+                g.pop(u, None)
+                del keys[u]
+                self._update_vertex(u)
+                for n in table[u]:
+                    self._update_vertex(n)
+                if u in sources:
+                    self._update_vertex(start)
+        if stats is not None:
+            stats.came_from = len(g)
+            stats.wall_time += time.perf_counter() - started
+
+    def move_to(self, cell):
+        """Moves the start to cell (normally the next cell of the path)."""
+        cid = self.index.cell_id(cell)
+        if cid != self.start_id:
+            passable = self.index.passable
+            old = self.start_id
+            if not passable[old]:
+                # A wall only has a distance while it is the start.
+                self.g.pop(old, None)
+                self.rhs.pop(old, None)
+                self.keys.pop(old, None)
+            x, y = self.start
+            self.km += abs(x - cell[0]) + abs(y - cell[1])
+            self.start_id = cid
+            self.start = tuple(cell)
+            if not passable[cid]:
+                self._update_vertex(cid)
+
+    def update(self, changed_ids):
+        """Takes in cells edited since the last call (ids from MazeIndex.set_cells)."""
+        table = self.index.neighbor_table
+        for cid in changed_ids:
+            self._update_vertex(cid)
+            # A changed cell's table entry lists its open neighbours, which are
+            # the cells whose edges to it appeared or disappeared.
+            for n in table[cid]:
+                self._update_vertex(n)
+        if not self.index.passable[self.start_id]:
+            self._update_vertex(self.start_id)
+
+    def next_cell(self):
+        """The (x, y) to step to from the start, or None at the exit or when it is unreachable."""
+        self._compute()
+        start = self.start_id
+        g = self.g
+        if start == self.goal_id or g.get(start, _INF) >= _INF:
+            return None
+        return self.index.cell_at(min(self.index.neighbor_table[start], key=lambda n: g.get(n, _INF)))
+
+    def distance(self):
+        """Steps from the start to the exit on the current shortest path, -1 if it is unreachable."""
+        self._compute()
+        d = self.g.get(self.start_id, _INF)
+        return d if d < _INF else -1
+
+    def path(self):
+        """The current shortest path from the start to the exit, [] if there is none."""
+        self._compute()
+        g = self.g
+        current = self.start_id
+        if g.get(current, _INF) >= _INF:
+            return []
+        table = self.index.neighbor_table
+        path = [current]
+        while current != self.goal_id:
+            current = min(table[current], key=lambda n: g.get(n, _INF))
+            path.append(current)
+        return [self.index.cell_at(cid) for cid in path]
+
+def iter_exit_dstar(planner):
+    """
+    Walks a DStarLite planner's path one cell at a time, moving its start
+    along. Cells edited between two next() calls (planner.update) are routed
+    around from the walker's current cell.
+    """
+    yield planner.start
+    while True:
+        cell = planner.next_cell()
+        if cell is None:
+            return
+        planner.move_to(cell)
+        if planner.stats is not None:
+            planner.stats.path_length += 1
+        yield cell
+
+def find_exit_dstar(player_pos, maze, index=None, stats=None):
+    index = _index_for(maze, index)
+    if index.exit_id is None:
+        return []
+    planner = DStarLite(index, (int(player_pos.x), int(player_pos.z)), stats)
+    path = planner.path()
+    if stats is not None:
+        stats.shortest_length = planner.distance()
+    return path
+
+def _bfs_distances(index, source_id, avoid_id=None, stats=None):
+    """Full BFS from source_id; returns a flat array('i') of step counts, -1 if unreached."""
+    table = index.neighbor_table
+    dist = array('i', [-1]) * (index.rows * index.cols)
+    dist[source_id] = 0
+    queue = deque([source_id])
+    popleft, append = _frontier_ops(stats, queue.popleft, queue.append, queue)
+    while queue:
+        current = popleft()
+        d = dist[current] + 1
+        for n in table[current]:
+            if n != avoid_id and dist[n] < 0:
+                dist[n] = d
+                append(n)
+    return dist
+
+def _padded_passable(index):
+    # Passability as a NumPy bool vector over padded column-major ids
+    # p = (x + 1) * (rows + 2) + (y + 1), with a blocked one-cell border so a
+    # shifted id never wraps into the next column. Cached on the index.
+    if index.padded_passable is None:
+        rows, cols = index.rows, index.cols
+        grid = np.zeros((cols + 2, rows + 2), dtype=bool)
+        grid[1:-1, 1:-1] = np.frombuffer(index.passable, dtype=np.uint8).reshape(cols, rows) != 0
+        index.padded_passable = grid.ravel()
+    return index.padded_passable
+
+def wavefront_distances(index, sources, avoid_id=None, combined=False, batch_size=64, stats=None):
+    """
+    BFS distances from many sources at once, expanded a whole frontier per step
+    with NumPy instead of one cell at a time.
+    Each step shifts the frontier ids by the four neighbour offsets, masks the
+    candidates with the passability array and the not-yet-reached cells, and
+    keeps the survivors as the next frontier. Every source gets its own layer,
+    so one call runs all the searches side by side.
+
+    sources is a list of cell ids. Returns an int32 array of shape
+    (len(sources), rows * cols) indexed by cell id, -1 for unreached cells;
+    with combined=True, a single (rows * cols,) field of the distance to the
+    nearest source. avoid_id is treated as a wall. Sources are processed
+    batch_size at a time to bound memory. A stats collector only has its
+    checkpoint() called once per frontier step. Requires NumPy.
+    """
+    if np is None:
+        raise ImportError("wavefront_distances requires NumPy")
+    rows, cols = index.rows, index.cols
+    R = rows + 2
+    size = (cols + 2) * R
+    passable = _padded_passable(index)
+    if avoid_id is not None:
+        passable = passable.copy()
+        passable[(avoid_id // rows + 1) * R + avoid_id % rows + 1] = False
+    offsets = np.array([R, -R, 1, -1])
+    padded = np.asarray(sources, dtype=np.int64)
+    padded = (padded // rows + 1) * R + padded % rows + 1
+
+    if combined:
+        batches = [(padded, np.zeros(len(padded), dtype=np.int64))]
+    else:
+        batches = [(padded[i:i + batch_size], np.arange(len(padded[i:i + batch_size]), dtype=np.int64))
+                   for i in range(0, len(padded), batch_size)]
+    results = []
+    for cells, layers in batches:
+        layer_count = 1 if combined else len(cells)
+        dist = np.full(layer_count * size, -1, dtype=np.int32)
+        # Scratch used to drop duplicate candidates without sorting: every copy of
+        # a cell writes its position, and only the copy whose write landed survives.
+        slot = np.empty(layer_count * size, dtype=np.int64)
+        layer_passable = np.tile(passable, layer_count)
+        frontier = np.unique(layers * size + cells)
+        dist[frontier] = 0
+        d = 0
+        while frontier.size:
+            if stats is not None:
+                stats.checkpoint()
+            d += 1
+            candidates = (frontier[:, None] + offsets).ravel()
+            candidates = candidates[layer_passable[candidates]]
+            candidates = candidates[dist[candidates] < 0]
+            positions = np.arange(candidates.size)
+            slot[candidates] = positions
+            frontier = candidates[slot[candidates] == positions]
+            dist[frontier] = d
+        # Drop the border and return to unpadded cell ids.
+        results.append(dist.reshape(layer_count, cols + 2, R)[:, 1:-1, 1:-1].reshape(layer_count, -1))
+    if combined:
+        return results[0][0]
+    if not results:
+        return np.empty((0, rows * cols), dtype=np.int32)
+    return np.concatenate(results)
+
+def next_step_to_exit(cell, index, field=None):
+    """
+    Constant-time steering: returns the neighbour of cell that is closest to the
+    exit according to the index's exit distance field, or None when cell is the
+    exit or cannot reach it. Repeatedly following it walks a shortest path.
+    field is an exit distance field of the same maze built elsewhere (e.g. by
+    planner_service), used instead of index.exit_distances().
+    """
+    dist = field if field is not None else index.exit_distances()
+    cid = index.cell_id(cell)
+    if dist[cid] == 0:
+        return None
+    best = None
+    best_dist = -1
+    for n in index.neighbor_table[cid]:
+        d = dist[n]
+        if d >= 0 and (best is None or d < best_dist):
+            best, best_dist = n, d
+    return index.cell_at(best) if best is not None else None
+
+def iter_exit_field(player_pos, maze, index=None, stats=None):
+    """
+    Lazy find_exit_field: yields the path one cell at a time, each step being a
+    constant-time field lookup, so the first cell is available as soon as the
+    field exists.
+    """
+    index = _index_for(maze, index)
+    start = (int(player_pos.x), int(player_pos.z))
+    dist = index.exit_distances()
+    if index.exit_id is None or dist[index.cell_id(start)] < 0:
+        return
+    step = start
+    while step is not None:
+        yield step
+        if stats is not None:
+            stats.expansions += 1  # One field lookup per step.
+        step = next_step_to_exit(step, index)
+
+def find_exit_field(player_pos, maze, index=None, stats=None):
+    """
+    Shortest path to the exit read off the exit distance field. Once the field
+    exists (first call per index) this costs O(path length), not a new search.
+    """
+    return list(iter_exit_field(player_pos, maze, index, stats))
+
+class JumpTable:
+    """
+    Goal-independent jump data for Jump Point Search, built once per MazeIndex.
+
+    Cells use padded column-major ids, p = (x + 1) * R + (y + 1) with R = rows + 2,
+    over a passability map with a one-cell blocked border, so scans never need
+    bounds checks. Moving horizontally changes p by +-R, vertically by +-1.
+    For every cell and horizontal direction it stores the next forced jump point
+    (-1 if a wall comes first) and the last open cell before the wall, which makes
+    each horizontal scan a lookup.
+    """
+    def __init__(self, index, stats=None):
+        rows, cols = index.rows, index.cols
+        R = rows + 2
+        self.R = R
+        size = (cols + 2) * R
+        pas = bytearray(size)
+        for x in range(cols):
+            base = (x + 1) * R + 1
+            pas[base:base + rows] = index.passable[x * rows:(x + 1) * rows]
+        self.passable = pas
+        self.jump_right, self.end_right = self._sweep(pas, size, R, range(size - R - 1, R, -1), stats)
+        self.jump_left, self.end_left = self._sweep(pas, size, -R, range(R + 1, size - R), stats)
+
+    @staticmethod
+    def _sweep(pas, size, step, order, stats=None):
+        # order visits each cell after the cell one step ahead of it.
+        jump = array('i', [-1]) * size
+        end = array('i', [-1]) * size
+        for chunk in range(0, len(order), CHECKPOINT_CELLS):
+            if stats is not None:
+                stats.checkpoint()
+            for p in order[chunk:chunk + CHECKPOINT_CELLS]:
+                q = p + step
+                if not pas[q]:
+                    end[p] = p
+                    continue
+                end[p] = end[q]
+                if (pas[q + 1] and not pas[q + 1 - step]) or (pas[q - 1] and not pas[q - 1 - step]):
+                    jump[p] = q
+                else:
+                    jump[p] = jump[q]
+        return jump, end
+
+    def padded_id(self, cell):
+        return (cell[0] + 1) * self.R + cell[1] + 1
+
+    def cell_at(self, p):
+        x, y = divmod(p, self.R)
+        return x - 1, y - 1
+
+    def jump_horizontal(self, p, step, goal):
+        """First jump point scanning from p by step (+-R): the goal, a forced cell, or -1."""
+        if step > 0:
+            jp, end = self.jump_right[p], self.end_right[p]
+            goal_ahead = p < goal <= end
+        else:
+            jp, end = self.jump_left[p], self.end_left[p]
+            goal_ahead = end <= goal < p
+        if goal_ahead and (goal - p) % self.R == 0 and (jp < 0 or abs(goal - p) <= abs(jp - p)):
+            return goal
+        return jp
+
+    def jump_vertical(self, p, step, goal):
+        """
+        Scans from p by step (+-1). Vertical moves may turn horizontal anywhere, so a
+        cell is a jump point if it is the goal or a horizontal scan from it finds one.
+        """
+        pas = self.passable
+        jump_right, jump_left = self.jump_right, self.jump_left
+        end_right, end_left = self.end_right, self.end_left
+        R = self.R
+        goal_row = goal % R
+        while True:
+            p += step
+            if not pas[p]:
+                return -1
+            if p == goal or jump_right[p] >= 0 or jump_left[p] >= 0:
+                return p
+            if p % R == goal_row and end_left[p] <= goal <= end_right[p]:
+                return p
+
+    def directions(self, p, arrived_by):
+        """Pruned scan steps from a jump point reached by moving arrived_by (None at the start)."""
+        R = self.R
+        if arrived_by is None:
+            return (R, -R, 1, -1)
+        if arrived_by == 1 or arrived_by == -1:
+            return (arrived_by, R, -R)
+        pas = self.passable
+        steps = [arrived_by]
+        for s in (1, -1):
+            if pas[p + s] and not pas[p + s - arrived_by]:
+                steps.append(s)
+        return steps
+
+def find_exit_jps(player_pos, maze, index=None, stats=None):
+    """
+    Jump Point Search for the 4-connected grid. Same contract as find_exit_astar:
+    a shortest path as a list of every (x, y) cell from the player to the exit.
+    Straight runs through open areas are skipped by the jump scans, so only jump
+    points go on the heap. The index's JumpTable is built on the first call.
+    """
+    index = _index_for(maze, index)
+    if index.exit_cell is None:
+        return []
+    if index.jump_table is None:
+        index.jump_table = JumpTable(index, stats)
+    jt = index.jump_table
+    R = jt.R
+    start = jt.padded_id((int(player_pos.x), int(player_pos.z)))
+    goal = jt.padded_id(index.exit_cell)
+    gx, gy = divmod(goal, R)
+    frontier = [(0, start)]
+    heappop, heappush = _frontier_ops(stats, heapq.heappop, heapq.heappush, frontier)
     came_from = {start: None}
+    arrived_by = {start: None}
     cost_so_far = {start: 0}
     while frontier:
-        current_priority, current = heapq.heappop(frontier)
-        if current == exit_cell:
+        _, current = heappop(frontier)
+        if current == goal:
             break
-        for n in neighbors(current, maze):
-            new_cost = cost_so_far[current] + 1
-            if n not in cost_so_far or new_cost < cost_so_far[n]:
-                cost_so_far[n] = new_cost
-                priority = new_cost + heuristic(n, exit_cell)
-                heapq.heappush(frontier, (priority, n))
-                came_from[n] = current
-    if exit_cell not in came_from:
+        current_cost = cost_so_far[current]
+        for step in jt.directions(current, arrived_by[current]):
+            if step == 1 or step == -1:
+                jump = jt.jump_vertical(current, step, goal)
+            else:
+                jump = jt.jump_horizontal(current, step, goal)
+            if jump < 0:
+                continue
+            # Jump points lie on a straight line from current.
+            new_cost = current_cost + (abs(jump - current) // R if step == R or step == -R else abs(jump - current))
+            if jump not in cost_so_far or new_cost < cost_so_far[jump]:
+                cost_so_far[jump] = new_cost
+                came_from[jump] = current
+                arrived_by[jump] = step
+                jx, jy = divmod(jump, R)
+                heappush(frontier, (new_cost + abs(jx - gx) + abs(jy - gy), jump))
+    if stats is not None:
+        stats.came_from += len(came_from)
+    if goal not in came_from:
         return []
-    path = []
-    current = exit_cell
+    # Expand the straight segments between jump points back into single cells.
+    points = []
+    current = goal
     while current is not None:
-        path.append(current)
+        points.append(current)
         current = came_from[current]
-    path.reverse()
+    points.reverse()
+    path = [jt.cell_at(points[0])]
+    for a, b in zip(points, points[1:]):
+        step = arrived_by[b]
+        for p in range(a + step, b + step, step):
+            path.append(jt.cell_at(p))
     return path
 
 def cell_in_room(cell, room):
@@ -153,80 +1075,738 @@ def cell_in_room(cell, room):
     x, y = cell
     return room.x1 <= x < room.x2 and room.y1 <= y < room.y2
 
-def find_exit_explore(player_pos, maze, rooms):
+class RoomGraph:
     """
-    Exploration mode: visit all room centers before heading to the exit.
+    Abstract graph over a generated maze for hierarchical (HPA*-style) queries.
+
+    Open cells are grouped into clusters: every room is one cluster, and the
+    corridor cells outside rooms are grouped by fixed sector_size x sector_size
+    sectors. (Where corridors cross or run side by side, almost every cell is a
+    junction, so sectors keep the node count bounded on crowded maps.)
+    Nodes are the cluster entrances: cells with an open neighbour in another cluster.
+    Edges carry exact costs: cost 1 between neighbouring entrances of different
+    clusters, and the in-cluster BFS distance between entrances of one cluster.
+    Building is O(W*H) once per maze; a query searches only the nodes and
+    refines the hops it is asked for with a BFS bounded by one cluster.
     """
-    start = (int(player_pos.x), int(player_pos.z))
-    exit_cell = None
-    rows = len(maze)
-    cols = len(maze[0])
-    for y in range(rows):
-        for x in range(cols):
-            if maze[y][x] == "E":
-                exit_cell = (x, y)
+    def __init__(self, index, rooms, sector_size=16, stats=None):
+        self.index = index
+        rows = index.rows
+        table = index.neighbor_table
+        passable = index.passable
+        size = rows * index.cols
+        cluster_of = array('i', [-1]) * size
+        for r, room in enumerate(rooms):
+            for x in range(max(room.x1, 0), min(room.x2, index.cols)):
+                for y in range(max(room.y1, 0), min(room.y2, rows)):
+                    cid = x * rows + y
+                    if passable[cid] and cluster_of[cid] < 0:
+                        cluster_of[cid] = r
+        sectors_per_column = (rows + sector_size - 1) // sector_size
+        for chunk in range(0, size, CHECKPOINT_CELLS):
+            if stats is not None:
+                stats.checkpoint()
+            for cid in range(chunk, min(chunk + CHECKPOINT_CELLS, size)):
+                if passable[cid] and cluster_of[cid] < 0:
+                    x, y = divmod(cid, rows)
+                    cluster_of[cid] = len(rooms) + (x // sector_size) * sectors_per_column + y // sector_size
+        self.cluster_of = cluster_of
+
+        entrances = {}
+        for chunk in range(0, size, CHECKPOINT_CELLS):
+            if stats is not None:
+                stats.checkpoint()
+            for cid in range(chunk, min(chunk + CHECKPOINT_CELLS, size)):
+                if passable[cid] and any(cluster_of[n] != cluster_of[cid] for n in table[cid]):
+                    entrances.setdefault(cluster_of[cid], []).append(cid)
+        self.entrances = entrances
+        self.nodes = {cid for cells in entrances.values() for cid in cells}
+
+        adj = {node: [] for node in self.nodes}
+        visited = 0  # Cells reached by the in-cluster BFS passes since the last checkpoint
+        for cluster, cells in entrances.items():
+            for a in cells:
+                dist = self._cluster_distances(a)
+                visited += len(dist)
+                if stats is not None and visited >= CHECKPOINT_CELLS:
+                    stats.checkpoint()
+                    visited = 0
+                for b in cells:
+                    if b != a and b in dist:
+                        adj[a].append((b, dist[b], cluster))
+                for n in table[a]:
+                    if cluster_of[n] != cluster:
+                        adj[a].append((n, 1, None))
+        self.adj = adj
+
+    def _cluster_distances(self, start):
+        """BFS distances from start to every cell of its cluster, moving only inside it."""
+        table = self.index.neighbor_table
+        cluster_of = self.cluster_of
+        cluster = cluster_of[start]
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            d = dist[current] + 1
+            for n in table[current]:
+                if cluster_of[n] == cluster and n not in dist:
+                    dist[n] = d
+                    queue.append(n)
+        return dist
+
+    def _attach(self, cell, other, extra):
+        """Adds temporary edges joining a query endpoint to its cluster's entrances (and to other)."""
+        if cell in self.nodes:
+            # Already in the graph; a non-node other in the same cluster links to it
+            # through its own attach.
+            return
+        cluster = self.cluster_of[cell]
+        dist = self._cluster_distances(cell)
+        targets = list(self.entrances.get(cluster, ()))
+        if other in dist:
+            targets.append(other)
+        for target in targets:
+            if target != cell and target in dist:
+                extra.setdefault(cell, []).append((target, dist[target], cluster))
+                extra.setdefault(target, []).append((cell, dist[target], cluster))
+
+    def abstract_path(self, start, goal, stats=None):
+        """
+        Searches the abstract graph from start to goal (flat cell ids).
+        Returns the list of (from, to, cluster) hops, cluster None for a single
+        step between clusters, or None if goal is unreachable.
+        """
+        if start == goal:
+            return []
+        extra = {}
+        self._attach(start, goal, extra)
+        self._attach(goal, start, extra)
+        rows = self.index.rows
+        gx, gy = divmod(goal, rows)
+        adj = self.adj
+        empty = []
+        frontier = [(0, start)]
+        heappop, heappush = _frontier_ops(stats, heapq.heappop, heapq.heappush, frontier)
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        while frontier:
+            _, current = heappop(frontier)
+            if current == goal:
                 break
-        if exit_cell is not None:
-            break
-    if exit_cell is None:
+            for n, cost, cluster in adj.get(current, empty) + extra.get(current, empty):
+                new_cost = cost_so_far[current] + cost
+                if n not in cost_so_far or new_cost < cost_so_far[n]:
+                    cost_so_far[n] = new_cost
+                    came_from[n] = (current, cluster)
+                    nx, ny = divmod(n, rows)
+                    heappush(frontier, (new_cost + abs(nx - gx) + abs(ny - gy), n))
+        if stats is not None:
+            stats.came_from += len(came_from)
+        if goal not in came_from:
+            return None
+        hops = []
+        current = goal
+        while came_from[current] is not None:
+            prev, cluster = came_from[current]
+            hops.append((prev, current, cluster))
+            current = prev
+        hops.reverse()
+        return hops
+
+    def refine(self, hop, stats=None):
+        """Turns one abstract hop into its (x, y) cells, excluding the hop's first cell."""
+        a, b, cluster = hop
+        if cluster is None:
+            return [self.index.cell_at(b)]
+        table = self.index.neighbor_table
+        cluster_of = self.cluster_of
+        came_from = {a: None}
+        queue = deque([a])
+        popleft, append = _frontier_ops(stats, queue.popleft, queue.append, queue)
+        while queue:
+            current = popleft()
+            if current == b:
+                break
+            for n in table[current]:
+                if cluster_of[n] == cluster and n not in came_from:
+                    came_from[n] = current
+                    append(n)
+        if stats is not None:
+            stats.came_from += len(came_from)
+        return self.index.path_cells(came_from, b)[1:]
+
+def iter_exit_hpa(player_pos, maze, rooms, index=None, stats=None):
+    """
+    Lazy find_exit_hpa: the abstract path is searched up front, then each hop is
+    refined into cells only when the walker reaches it.
+    """
+    index = _index_for(maze, index)
+    if index.exit_id is None:
+        return
+    if index.room_graph is None:
+        index.room_graph = RoomGraph(index, rooms, stats=stats)
+    graph = index.room_graph
+    start = (int(player_pos.x), int(player_pos.z))
+    start_id = index.cell_id(start)
+    if not index.passable[start_id]:
+        # The abstract graph only covers open cells; fall back to a plain search.
+        yield from find_exit_astar(player_pos, maze, index, stats)
+        return
+    hops = graph.abstract_path(start_id, index.exit_id, stats)
+    if hops is None:
+        return
+    yield start
+    for hop in hops:
+        yield from graph.refine(hop, stats)
+
+def find_exit_hpa(player_pos, maze, rooms, index=None, stats=None):
+    """
+    Hierarchical search over the RoomGraph (built on the first call per index).
+    Returns a shortest path in the same format as find_exit_bfs.
+    """
+    return list(iter_exit_hpa(player_pos, maze, rooms, index, stats))
+
+def room_distance_matrix(index, centers, stats=None):
+    """
+    True walking distances between room centers, one BFS per center (run as a
+    single wavefront_distances call when NumPy is available), with the
+    exit treated as blocked (stepping on it ends the level). Entry [i][j] is -1
+    when center j cannot be reached from center i. Cached on the index for the
+    last list of centers, so replans on the same maze skip the BFS passes.
+    """
+    key = tuple(centers)
+    cached = index.room_distance_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    ids = [index.cell_id(center) for center in centers]
+    if np is not None and ids:
+        # All the BFS passes in one wavefront call.
+        matrix = wavefront_distances(index, ids, index.exit_id, stats=stats)[:, ids].tolist()
+    else:
+        matrix = []
+        for cid in ids:
+            if stats is not None:
+                stats.checkpoint()
+            dist = _bfs_distances(index, cid, index.exit_id)
+            matrix.append([dist[other] for other in ids])
+    index.room_distance_cache = (key, matrix)
+    return matrix
+
+def plan_room_tour(start_dists, matrix, end_dists, max_rounds=50, candidates=8):
+    """
+    Orders the rooms of a tour that starts at the player and ends at the exit.
+    start_dists[i] / end_dists[i] are the distances from the start to room i and
+    from room i to the exit, matrix the room-to-room distances (-1 = unreachable).
+    Builds a nearest-neighbour tour, then improves it with 2-opt and Or-opt moves
+    (segments of 1 to 3 rooms) until no move helps. Returns the room order.
+    Moves are only tried towards each stop's `candidates` nearest stops, which
+    keeps a round at O(n * candidates) instead of O(n^2) on many-room maps.
+    """
+    count = len(matrix)
+    if count == 0:
         return []
-    
-    # Identify the room that contains the exit.
-    exit_room = None
-    for room in rooms:
-        if cell_in_room(exit_cell, room):
-            exit_room = room
+    unreachable = 10 ** 9
+    start, end = count, count + 1
+    # Full distance table with the start and the exit as two extra nodes.
+    dist = [[d if d >= 0 else unreachable for d in row] + [0, 0] for row in matrix]
+    dist.append([d if d >= 0 else unreachable for d in start_dists] + [0, 0])
+    dist.append([d if d >= 0 else unreachable for d in end_dists] + [0, 0])
+    for i in range(count):
+        dist[i][start] = dist[start][i]
+        dist[i][end] = dist[end][i]
+    # Nearest other rooms of every stop (the start and the exit never move).
+    near = [heapq.nsmallest(candidates, (r for r in range(count) if r != node), key=dist[node].__getitem__)
+            for node in range(count + 2)]
+
+    # Nearest neighbour from the start.
+    remaining = set(range(count))
+    tour = [start]
+    while remaining:
+        last = dist[tour[-1]]
+        nearest = min(remaining, key=lambda room: (last[room], room))
+        tour.append(nearest)
+        remaining.remove(nearest)
+    tour.append(end)
+    size = len(tour)
+    pos = [0] * size
+    for i, node in enumerate(tour):
+        pos[node] = i
+
+    for _ in range(max_rounds):
+        improved = False
+        # 2-opt: reverse tour[i..j] when that shortens the two edges around it.
+        # Either new edge must be shorter than the old edge it starts from, so
+        # only a's and d's nearest stops need to be tried as the other end.
+        for i in range(1, size - 1):
+            a, b = tour[i - 1], tour[i]
+            for c in near[a]:
+                if dist[a][c] >= dist[a][b]:
+                    break
+                j = pos[c]
+                if j > i:
+                    d = tour[j + 1]
+                    if dist[a][c] + dist[b][d] < dist[a][b] + dist[c][d]:
+                        tour[i:j + 1] = reversed(tour[i:j + 1])
+                        for k in range(i, j + 1):
+                            pos[tour[k]] = k
+                        improved = True
+                        break
+        for j in range(1, size - 1):
+            c, d = tour[j], tour[j + 1]
+            for b in near[d]:
+                if dist[d][b] >= dist[c][d]:
+                    break
+                i = pos[b]
+                if i < j:
+                    a = tour[i - 1]
+                    if dist[a][c] + dist[b][d] < dist[a][b] + dist[c][d]:
+                        tour[i:j + 1] = reversed(tour[i:j + 1])
+                        for k in range(i, j + 1):
+                            pos[tour[k]] = k
+                        improved = True
+                        break
+        # Or-opt: move a run of 1-3 rooms (possibly reversed) next to one of
+        # the nearest stops of its ends.
+        for length in (1, 2, 3):
+            i = 1
+            while i + length < size:
+                first, last = tour[i], tour[i + length - 1]
+                before, after = tour[i - 1], tour[i + length]
+                gain = dist[before][first] + dist[last][after] - dist[before][after]
+                best = None
+                for c in set(near[first] + near[last]):
+                    k = pos[c]
+                    for j in (k - 1, k):
+                        if j < 0 or j + 1 >= size or i - 1 <= j < i + length:
+                            continue
+                        p, q = tour[j], tour[j + 1]
+                        forward = dist[p][first] + dist[last][q] - dist[p][q]
+                        backward = dist[p][last] + dist[first][q] - dist[p][q]
+                        if forward < gain and (best is None or forward < best[0]):
+                            best = (forward, j, False)
+                        if backward < gain and (best is None or backward < best[0]):
+                            best = (backward, j, True)
+                if best is not None:
+                    _, j, reverse = best
+                    segment = tour[i:i + length]
+                    if reverse:
+                        segment.reverse()
+                    del tour[i:i + length]
+                    insert_at = j + 1 if j < i else j + 1 - length
+                    tour[insert_at:insert_at] = segment
+                    for k in range(min(i, insert_at), max(i + length, insert_at + length)):
+                        pos[tour[k]] = k
+                    improved = True
+                else:
+                    i += 1
+        if not improved:
             break
+    return tour[1:-1]
+
+def iter_exit_explore(player_pos, maze, rooms, index=None, cache=None, stats=None):
+    """
+    Exploration mode: visit all room centers before heading to the exit.
+    The visiting order is a short tour over true corridor distances
+    (see room_distance_matrix and plan_room_tour); each leg is an A* path that
+    keeps off the exit until the final leg. Legs are searched one room at a
+    time, as the walker reaches the end of the previous one. With a PathCache,
+    room-to-room legs are kept there and reused by later plans on the same maze.
+    """
+    index = _index_for(maze, index)
+    start = (int(player_pos.x), int(player_pos.z))
+    exit_cell = index.exit_cell
+    if exit_cell is None:
+        return
+    exit_id = index.exit_id
 
-    # Collect centers of all rooms.
-    exit_room_center = None
-    other_room_centers = []
+    # Unique, reachable room centers (in room order, so the cache key is stable).
+    start_dist = _bfs_distances(index, index.cell_id(start), exit_id, stats)
+    centers = []
     for room in rooms:
         center = (int(room.center[0]), int(room.center[1]))
-        if room == exit_room:
-            exit_room_center = center
-        else:
-            other_room_centers.append(center)
-    other_room_centers = list(set(other_room_centers))
-    
-    overall_path = []
-    current = start
-
-    # If the exit room center exists and is more than 1 cell away, go there first.
-    if exit_room_center is not None and heuristic(start, exit_room_center) > 1:
-        segment = bfs_path_no_exit(current, exit_room_center, maze, exit_cell)
-        if not segment:
-            segment = bfs_path(current, exit_room_center, maze)
-        overall_path.extend(segment)
-        current = exit_room_center
-    else:
-        if exit_room_center is not None and exit_room_center not in other_room_centers:
-            other_room_centers.append(exit_room_center)
-            exit_room_center = None
-
-    # Explore all other room centers.
-    while other_room_centers:
-        if exit_room is not None and cell_in_room(current, exit_room) and heuristic(current, exit_cell) <= 1:
-            other_room_centers.sort(key=lambda p: heuristic(p, exit_cell), reverse=True)
-        else:
-            other_room_centers.sort(key=lambda p: heuristic(current, p))
-        target = other_room_centers.pop(0)
-        segment = bfs_path(current, target, maze)
+        if center != exit_cell and center not in centers and start_dist[index.cell_id(center)] >= 0:
+            centers.append(center)
+    matrix = room_distance_matrix(index, centers, stats)
+    exit_dist = index.exit_distances()
+    order = plan_room_tour([start_dist[index.cell_id(c)] for c in centers], matrix,
+                           [exit_dist[index.cell_id(c)] for c in centers])
+
+    yield start
+    current = index.cell_id(start)
+    for target in [index.cell_id(centers[i]) for i in order] + [exit_id]:
+        segment = None
+        if cache is not None:
+            leg = (index.cell_at(current), index.cell_at(target))
+            segment = cache.lookup(index.fingerprint(), "explore-leg", *leg)
+        if segment is None:
+            avoid = exit_id if target != exit_id else None
+            segment = _astar_ids(index, current, target, avoid, stats)
+            if not segment and avoid is not None:
+                segment = _astar_ids(index, current, target, stats=stats)
+            if cache is not None:
+                cache.store(index.fingerprint(), "explore-leg", *leg, segment)
         if segment:
-            if overall_path and segment[0] == overall_path[-1]:
-                overall_path.extend(segment[1:])
-            else:
-                overall_path.extend(segment)
+            yield from segment[1:]
             current = target
 
-    # Finally, go from last visited room to the exit.
-    segment = bfs_path(current, exit_cell, maze)
-    if segment:
-        if overall_path and segment[0] == overall_path[-1]:
-            overall_path.extend(segment[1:])
+def find_exit_explore(player_pos, maze, rooms, index=None, cache=None, stats=None):
+    return list(iter_exit_explore(player_pos, maze, rooms, index, cache, stats))
+
+# Algorithms whose paths are shortest paths: any suffix of one is itself a
+# shortest path from its first cell, so PathCache can serve it.
+SHORTEST_PATH_ALGORITHMS = {"bfs", "astar", "field", "jps", "hpa", "bibfs", "biastar", "dstar"}
+
+class PathCache:
+    """
+    Bounded LRU cache of bot paths keyed by (maze fingerprint, algorithm, start,
+    goal), with hit/miss counters. For shortest-path algorithms a lookup whose
+    start lies on a cached path to the same goal is served with the rest of
+    that path (counted in suffix_hits) instead of a new search.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> path tuple
+        self.suffixes = {}  # (fingerprint, algorithm, goal) -> {cell: (key, position)}
+        self.hits = 0
+        self.suffix_hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint, algorithm, start, goal):
+        """Returns a copy of the cached path from start to goal, or None on a miss."""
+        key = (fingerprint, algorithm, start, goal)
+        path = self.entries.get(key)
+        if path is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(path)
+        if algorithm in SHORTEST_PATH_ALGORITHMS:
+            found = self.suffixes.get((fingerprint, algorithm, goal), {}).get(start)
+            if found is not None:
+                source, position = found
+                self.entries.move_to_end(source)
+                self.suffix_hits += 1
+                return list(self.entries[source][position:])
+        self.misses += 1
+        return None
+
+    def store(self, fingerprint, algorithm, start, goal, path):
+        key = (fingerprint, algorithm, start, goal)
+        self.entries[key] = tuple(path)
+        self.entries.move_to_end(key)
+        if algorithm in SHORTEST_PATH_ALGORITHMS:
+            cells = self.suffixes.setdefault((fingerprint, algorithm, goal), {})
+            for position, cell in enumerate(path):
+                cells.setdefault(cell, (key, position))
+        while len(self.entries) > self.max_entries:
+            old_key, old_path = self.entries.popitem(last=False)
+            cells = self.suffixes.get((old_key[0], old_key[1], old_key[3]))
+            if cells is None:
+                continue
+            for cell in old_path:
+                if cells.get(cell, (None,))[0] == old_key:
+                    del cells[cell]
+            if not cells:
+                del self.suffixes[(old_key[0], old_key[1], old_key[3])]
+
+    def clear(self):
+        self.entries.clear()
+        self.suffixes.clear()
+
+# Shared cache for callers that do not manage their own.
+path_cache = PathCache()
+
+def _recorded(steps, cache, key):
+    # Passes a lazy path through and caches it once it has been walked to the end.
+    cells = []
+    for cell in steps:
+        cells.append(cell)
+        yield cell
+    cache.store(*key, cells)
+
+def iter_exit_path(algorithm, player_pos, maze, rooms, index=None, cache=None, stats=None, heading=None):
+    """
+    Lazy find_exit: an iterator over the same cells, for walkers that consume a
+    path one step at a time. FIELD, HPA and EXPLORE produce cells incrementally
+    (see their iter_exit_* variants); the single-search algorithms cannot commit
+    to a step before their search reaches the exit, so they run it on the first
+    next() call. With a PathCache, cached paths are replayed and lazily
+    produced ones are stored once fully consumed.
+    """
+    if algorithm not in ("field", "hpa", "explore"):
+        return _iter_found(algorithm, player_pos, maze, rooms, index, cache, stats, heading)
+    if stats is not None:
+        index = _index_for(maze, index)
+        _start_stats(stats, algorithm, player_pos, index)
+    if cache is not None:
+        index = _index_for(maze, index)
+        key = (index.fingerprint(), algorithm, (int(player_pos.x), int(player_pos.z)), index.exit_cell)
+        path = cache.lookup(*key)
+        if path is not None:
+            return iter(path)
+    if algorithm == "field":
+        steps = iter_exit_field(player_pos, maze, index, stats)
+    elif algorithm == "hpa":
+        steps = iter_exit_hpa(player_pos, maze, rooms, index, stats)
+    else:
+        steps = iter_exit_explore(player_pos, maze, rooms, index, cache, stats)
+    if stats is not None:
+        steps = _measured(steps, stats)
+    return steps if cache is None else _recorded(steps, cache, key)
+
+def _start_stats(stats, algorithm, player_pos, index):
+    stats.algorithm = algorithm
+    start_id = index.cell_id((int(player_pos.x), int(player_pos.z)))
+    if index.exit_id is None or not (stats.shortest or index.has_exit_distances()):
+        stats.shortest_length = -1
+    else:
+        stats.shortest_length = index.exit_distances()[start_id]
+
+def _measured(steps, stats):
+    # Passes a lazy path through, timing the work done to produce each cell
+    # and counting its length.
+    clock = time.perf_counter
+    steps = iter(steps)
+    cells = 0
+    while True:
+        started = clock()
+        cell = next(steps, None)
+        stats.wall_time += clock() - started
+        if cell is None:
+            return
+        stats.path_length = cells
+        cells += 1
+        yield cell
+
+def _iter_found(algorithm, player_pos, maze, rooms, index, cache=None, stats=None, heading=None):
+    # A generator, so the search is deferred to the first next() like the lazy variants.
+    yield from find_exit(algorithm, player_pos, maze, rooms, index, cache, stats, heading)
+
+def find_exit(algorithm, player_pos, maze, rooms, index=None, cache=None, stats=None, heading=None):
+    """
+    Runs the named algorithm ("bfs", "dfs", "astar", "explore", "field", "jps",
+    "hpa", "bibfs", "biastar", "dstar" or "timed"). With a PathCache, repeated
+    queries on the same maze are answered from it. A SearchStats passed as
+    stats collects the search's counters (a cache hit leaves them untouched).
+    heading (0-3, see HEADING_STEPS) is the way the bot faces, used by "timed".
+    """
+    if stats is not None:
+        index = _index_for(maze, index)
+        _start_stats(stats, algorithm, player_pos, index)
+        started = time.perf_counter()
+    if cache is not None:
+        index = _index_for(maze, index)
+        start = (int(player_pos.x), int(player_pos.z))
+        if algorithm == "timed":
+            start += (heading,)
+        key = (index.fingerprint(), algorithm, start, index.exit_cell)
+        path = cache.lookup(*key)
+        if path is None:
+            path = _search(algorithm, player_pos, maze, rooms, index, cache, stats, heading)
+            cache.store(*key, path)
+    else:
+        path = _search(algorithm, player_pos, maze, rooms, index, None, stats, heading)
+    if stats is not None:
+        stats.wall_time += time.perf_counter() - started
+        stats.path_length = max(len(path) - 1, 0)
+    return path
+
+def _search(algorithm, player_pos, maze, rooms, index, cache, stats, heading=None):
+    if algorithm == "bfs":
+        return find_exit_bfs(player_pos, maze, index, stats)
+    elif algorithm == "dfs":
+        return find_exit_dfs(player_pos, maze, index, stats)
+    elif algorithm == "astar":
+        return find_exit_astar(player_pos, maze, index, stats)
+    elif algorithm == "explore":
+        return find_exit_explore(player_pos, maze, rooms, index, cache, stats)
+    elif algorithm == "field":
+        return find_exit_field(player_pos, maze, index, stats)
+    elif algorithm == "jps":
+        return find_exit_jps(player_pos, maze, index, stats)
+    elif algorithm == "hpa":
+        return find_exit_hpa(player_pos, maze, rooms, index, stats)
+    elif algorithm == "bibfs":
+        return find_exit_bibfs(player_pos, maze, index, stats)
+    elif algorithm == "biastar":
+        return find_exit_biastar(player_pos, maze, index, stats)
+    elif algorithm == "dstar":
+        return find_exit_dstar(player_pos, maze, index, stats)
+    elif algorithm == "timed":
+        return find_exit_timed(player_pos, maze, index, stats, heading)
+    return []
+
+# Bot commands. A command stream is an array('I') of runs, count * 4 + command.
+FORWARD, TURN_LEFT, TURN_RIGHT, TURN_AROUND = range(4)
+TURN_ANGLES = {TURN_LEFT: 90, TURN_RIGHT: -90, TURN_AROUND: 180}
+# Headings 0-3 are the game's facing angles 0, 90, 180 and 270 degrees (angle a
+# faces (sin a, cos a)); HEADING_STEPS gives the (dx, dy) of one step forward.
+HEADING_STEPS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+_STEP_HEADINGS = {step: heading for heading, step in enumerate(HEADING_STEPS)}
+
+def compile_commands(path, heading):
+    """
+    Run-length encodes a path of adjacent cells as bot commands for a walker
+    that starts on path[0] facing heading: each turn (count 1) is followed by
+    the FORWARD run it sets up. Much smaller than the path itself, since a
+    corridor of any length is one entry.
+    """
+    commands = array('I')
+    run = 0
+    for (x, y), (nx, ny) in zip(path, path[1:]):
+        step_heading = _STEP_HEADINGS[(nx - x, ny - y)]
+        if step_heading != heading:
+            if run:
+                commands.append(run * 4 + FORWARD)
+                run = 0
+            # +90 degrees is a left turn.
+            commands.append(4 + (TURN_LEFT, TURN_AROUND, TURN_RIGHT)[(step_heading - heading) % 4 - 1])
+            heading = step_heading
+        run += 1
+    if run:
+        commands.append(run * 4 + FORWARD)
+    return commands
+
+def iter_moves(commands):
+    """Expands a command stream into one command per bot action (FORWARD once per cell)."""
+    for run in commands:
+        command = run & 3
+        for _ in range(run >> 2):
+            yield command
+
+class CommandQueue:
+    """
+    A command stream that can still grow while the bot carries it out:
+    extend() appends runs as they arrive (e.g. in chunks from
+    planner_service), next_command() takes one action off the front and
+    returns None once everything received so far has been done. A FORWARD
+    run split across two chunks is joined again, so received counts the same
+    entries compile_commands gives for the whole path.
+    """
+    def __init__(self):
+        self.runs = deque()
+        self.received = 0
+        self.forward = False  # Whether the last run received was a FORWARD run
+
+    def extend(self, commands):
+        runs = self.runs
+        for run in commands:
+            if run & 3 == FORWARD and self.forward:
+                if runs:
+                    runs[-1] += run & ~3  # Adds the count
+                else:
+                    runs.append(run)
+                continue
+            self.forward = run & 3 == FORWARD
+            runs.append(run)
+            self.received += 1
+
+    def next_command(self):
+        runs = self.runs
+        if not runs:
+            return None
+        run = runs[0]
+        if run >> 2 > 1:
+            runs[0] = run - 4
         else:
-            overall_path.extend(segment)
-    return overall_path
+            runs.popleft()
+        return run & 3
+
+def find_exit_commands(algorithm, player_pos, heading, maze, rooms, index=None, cache=None, stats=None):
+    """find_exit as a command stream for a bot facing heading (0-3, see HEADING_STEPS)."""
+    commands = compile_commands(find_exit(algorithm, player_pos, maze, rooms, index, cache, stats, heading), heading)
+    if stats is not None:
+        stats.episode_time = episode_time(commands)
+    return commands
+
+# How long the game's bot takes per cell and per turn (pymazemain's
+# move_duration and turn_duration). A turn is one animation whatever its
+# angle, so turning around costs the same as a quarter turn.
+MOVE_TIME = 0.2
+TURN_TIME = 0.15
+
+def episode_time(commands, move_time=MOVE_TIME, turn_time=TURN_TIME):
+    """Seconds the bot needs to carry out a command stream."""
+    total = 0.0
+    for run in commands:
+        if run & 3 == FORWARD:
+            total += (run >> 2) * move_time
+        else:
+            total += turn_time
+    return total
+
+def find_exit_timed(player_pos, maze, index=None, stats=None, heading=None,
+                    move_time=MOVE_TIME, turn_time=TURN_TIME):
+    """
+    Fastest route for the bot rather than the fewest cells: A* over (cell,
+    heading) states, where a step costs move_time plus turn_time if it needs
+    a turn first. Prefers long straight runs over zig-zags through rooms.
+    heading (0-3, see HEADING_STEPS) is the way the bot faces at the start;
+    None lets it start facing any way.
+    """
+    index = _index_for(maze, index)
+    if index.exit_id is None:
+        return []
+    table = index.neighbor_table
+    rows = index.rows
+    goal_id = index.exit_id
+    goal_x, goal_y = divmod(goal_id, rows)
+    # Integer milliseconds, so equal times compare equal.
+    move_cost = round(move_time * 1000)
+    turn_cost = round(turn_time * 1000)
+    # Heading of the step from a cell to each neighbour, by id difference.
+    step_heading = {1: 0, rows: 1, -1: 2, -rows: 3}
+
+    def estimate(cid, facing):
+        # Manhattan distance plus one turn for every direction still needed
+        # that the bot is not already facing.
+        x, y = divmod(cid, rows)
+        dx = goal_x - x
+        dy = goal_y - y
+        needed = (dy > 0, dx > 0, dy < 0, dx < 0)
+        turns = sum(needed) - needed[facing]
+        return (abs(dx) + abs(dy)) * move_cost + turns * turn_cost
+
+    start_id = index.cell_id((int(player_pos.x), int(player_pos.z)))
+    frontier = []
+    heappop, heappush = _frontier_ops(stats, heapq.heappop, heapq.heappush, frontier)
+    came_from = {}
+    cost_so_far = {}
+    for facing in (range(4) if heading is None else (heading,)):
+        state = start_id * 4 + facing
+        came_from[state] = None
+        cost_so_far[state] = 0
+        heappush(frontier, (estimate(start_id, facing), state))
+    goal = None
+    while frontier:
+        priority, state = heappop(frontier)
+        current, facing = divmod(state, 4)
+        if current == goal_id:
+            goal = state
+            break
+        cost = cost_so_far[state]
+        if priority - estimate(current, facing) > cost:
+            continue  # Stale entry.
+        for n in table[current]:
+            new_facing = step_heading[n - current]
+            new_cost = cost + move_cost + (turn_cost if new_facing != facing else 0)
+            new_state = n * 4 + new_facing
+            if new_cost < cost_so_far.get(new_state, new_cost + 1):
+                cost_so_far[new_state] = new_cost
+                came_from[new_state] = state
+                heappush(frontier, (new_cost + estimate(n, new_facing), new_state))
+    if stats is not None:
+        stats.came_from += len(came_from)
+    if goal is None:
+        return []
+    if stats is not None:
+        stats.episode_time = cost_so_far[goal] / 1000
+    path = []
+    while goal is not None:
+        path.append(index.cell_at(goal // 4))
+        goal = came_from[goal]
+    path.reverse()
+    return path
 
 if __name__ == "__main__":
     # Simple test for A* on a small maze.
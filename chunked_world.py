@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Chunked, deterministic world generation built on nethack_map_generator.
+
+The world is split into chunk_size x chunk_size tiles. Each tile is generated
+on demand from (world_seed, chunk_x, chunk_y) alone, so the same chunk always
+comes out the same no matter which chunks were generated before it.
+
+Chunks are linked through "portals": every shared chunk edge gets one open
+border cell whose position is derived from the edge itself, so both chunks on
+either side agree on it and their corridors line up across the border.
+Only the chunks near the player are kept; the least recently used ones are
+evicted once max_chunks is exceeded.
+"""
+import random
+from collections import OrderedDict
+
+import nethack_map_generator
+
+def _edge_rng(world_seed, kind, chunk_x, chunk_y):
+    # String seeds are hashed with SHA-512 by random.Random, so they are
+    # stable across runs (unlike hash()).
+    return random.Random(f"{world_seed}:{kind}:{chunk_x}:{chunk_y}")
+
+def edge_portal(world_seed, kind, chunk_x, chunk_y, chunk_size):
+    """
+    Offset along the edge of the portal cell for an edge.
+    kind 'v' is the west edge of chunk (chunk_x, chunk_y) (a row offset),
+    kind 'h' is its north edge (a column offset). Corners are never used.
+    """
+    return _edge_rng(world_seed, kind, chunk_x, chunk_y).randint(1, chunk_size - 2)
+
+def generate_chunk(world_seed, chunk_x, chunk_y, chunk_size=64, max_rooms=12,
+                   room_min_size=3, room_max_size=9):
+    """
+    Generates one chunk as a list of strings (chunk-local coordinates) plus
+    its rooms translated to world coordinates.
+    Chunks have no exit; each of the four border portals is joined by a
+    corridor to the nearest center of a connected room.
+    """
+    size = chunk_size
+    rng = random.Random(f"{world_seed}:chunk:{chunk_x}:{chunk_y}")
+    rooms, corridors = nethack_map_generator._place_rooms(
+        size, size, max_rooms, room_min_size, room_max_size, rng=rng)
+
+    portals = [
+        (0, edge_portal(world_seed, 'v', chunk_x, chunk_y, size)),              # west
+        (size - 1, edge_portal(world_seed, 'v', chunk_x + 1, chunk_y, size)),   # east
+        (edge_portal(world_seed, 'h', chunk_x, chunk_y, size), 0),              # north
+        (edge_portal(world_seed, 'h', chunk_x, chunk_y + 1, size), size - 1),   # south
+    ]
+    # _place_rooms chains rooms[0..len(corridors)] with corridors; a trailing
+    # extra 6x6 room is left unconnected, so portals never lead to it.
+    linked = rooms[:len(corridors) + 1]
+    for index, portal in enumerate(portals):
+        if linked:
+            target = min((room.center for room in linked),
+                         key=lambda c: abs(c[0] - portal[0]) + abs(c[1] - portal[1]))
+        else:
+            target = (size // 2, size // 2)
+        # West/east portals leave the border horizontally, north/south ones vertically,
+        # so the first corridor cell is always the border cell itself.
+        corridors.append((portal, target, index < 2))
+
+    map_grid = nethack_map_generator._carve_list(size, size, rooms, corridors, None)
+    nethack_map_generator._mark_black_list(map_grid, rooms)
+    maze = [''.join(row) for row in map_grid]
+    origin_x, origin_y = chunk_x * size, chunk_y * size
+    world_rooms = [nethack_map_generator.Rect(room.x1 + origin_x, room.y1 + origin_y,
+                                              room.x2 - room.x1, room.y2 - room.y1)
+                   for room in rooms]
+    return maze, world_rooms
+
+class ChunkedWorld:
+    """
+    Effectively unbounded world made of lazily generated chunks with LRU eviction.
+    Cells are addressed in world coordinates (x = column, y = row), which may be negative.
+    """
+    def __init__(self, world_seed, chunk_size=64, max_chunks=64, load_radius=1,
+                 max_rooms=12, room_min_size=3, room_max_size=9):
+        self.world_seed = world_seed
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.load_radius = load_radius
+        self.max_rooms = max_rooms
+        self.room_min_size = room_min_size
+        self.room_max_size = room_max_size
+        self.chunks = OrderedDict()  # (chunk_x, chunk_y) -> (maze, rooms)
+        self.generated = 0
+        self.evicted = 0
+
+    def chunk_coords(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    def get_chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = generate_chunk(self.world_seed, chunk_x, chunk_y, self.chunk_size,
+                               self.max_rooms, self.room_min_size, self.room_max_size)
+        self.generated += 1
+        self.chunks[key] = chunk
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+            self.evicted += 1
+        return chunk
+
+    def cell(self, x, y):
+        chunk_x, chunk_y = self.chunk_coords(x, y)
+        maze, _ = self.get_chunk(chunk_x, chunk_y)
+        return maze[y - chunk_y * self.chunk_size][x - chunk_x * self.chunk_size]
+
+    def update(self, player_pos):
+        """
+        Loads the chunks within load_radius of the player's chunk
+        (player_pos.x = column, player_pos.z = row) and returns their keys.
+        The player's own chunk is touched last so it is the most recently used.
+        """
+        center_x, center_y = self.chunk_coords(int(player_pos.x), int(player_pos.z))
+        r = self.load_radius
+        keys = [(center_x + dx, center_y + dy)
+                for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+                if (dx, dy) != (0, 0)]
+        keys.append((center_x, center_y))
+        for key in keys:
+            self.get_chunk(*key)
+        return keys
+
+    def window(self, chunk_x0, chunk_y0, chunk_x1, chunk_y1):
+        """
+        Stitches the chunks in [chunk_x0, chunk_x1] x [chunk_y0, chunk_y1] into one
+        list-of-strings maze. Returns (maze, rooms, (origin_x, origin_y)) where the
+        origin is the world position of maze[0][0].
+        """
+        size = self.chunk_size
+        maze = []
+        rooms = []
+        for chunk_y in range(chunk_y0, chunk_y1 + 1):
+            row_chunks = [self.get_chunk(chunk_x, chunk_y) for chunk_x in range(chunk_x0, chunk_x1 + 1)]
+            for i in range(size):
+                maze.append(''.join(chunk_maze[i] for chunk_maze, _ in row_chunks))
+            for _, chunk_rooms in row_chunks:
+                rooms.extend(chunk_rooms)
+        return maze, rooms, (chunk_x0 * size, chunk_y0 * size)
+
+if __name__ == "__main__":
+    world = ChunkedWorld(world_seed=42, chunk_size=32, max_rooms=6, room_max_size=7)
+    maze, rooms, origin = world.window(0, 0, 1, 1)
+    print("Window origin:", origin, "rooms:", len(rooms))
+    for row in maze:
+        print(row)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache of generated maps.
+
+Entries are keyed by (width, height, max_rooms, room_min_size, room_max_size,
+seed, generator version) and stored one per file in a fixed binary layout
+(little endian):
+
+    header  b'PMZC', uint32 layout version, uint32 generator version,
+            uint32 width, uint32 height, uint32 room count
+    rooms   int32 x1, y1, x2, y2 per room
+    grid    width * height uint8 cell codes, row-major
+    labels  width * height int32 component labels (see
+            nethack_map_generator.label_components), row-major
+
+A hit maps the file with mmap and returns the grid and labels as read-only
+NumPy views of it, so nothing is parsed, labelled or allocated per cell. The cache directory is kept
+under max_bytes by deleting the least recently used entries (by mtime, which
+is refreshed on every hit).
+"""
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+
+import nethack_map_generator
+
+CACHE_MAGIC = b'PMZC'
+CACHE_LAYOUT_VERSION = 2
+_HEADER = struct.Struct('<4sIIIII')
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pymazelabyrinth")
+
+class MapCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('ascii')).hexdigest()
+        return os.path.join(self.directory, digest + ".pmzc")
+
+    def get(self, key):
+        """Returns (grid, rooms, labels) for a key, or None on a miss. grid and labels are read-only mmap views."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if len(mm) < _HEADER.size:
+            mm.close()
+            self.misses += 1
+            return None
+        magic, layout, generator, width, height, room_count = _HEADER.unpack_from(mm, 0)
+        grid_offset = _HEADER.size + room_count * 16
+        if (magic != CACHE_MAGIC or layout != CACHE_LAYOUT_VERSION or
+                generator != nethack_map_generator.GENERATOR_VERSION or
+                len(mm) != grid_offset + width * height * 5):
+            mm.close()
+            self.misses += 1
+            return None
+        table = np.frombuffer(mm, dtype='<i4', count=room_count * 4, offset=_HEADER.size).reshape(-1, 4)
+        rooms = [nethack_map_generator.Rect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+                 for x1, y1, x2, y2 in table]
+        grid = np.frombuffer(mm, dtype=np.uint8, count=width * height, offset=grid_offset).reshape(height, width)
+        labels = np.frombuffer(mm, dtype='<i4', count=width * height,
+                               offset=grid_offset + width * height).reshape(height, width)
+        try:
+            os.utime(path)  # Mark as recently used.
+        except OSError:
+            pass
+        self.hits += 1
+        return grid, rooms, labels
+
+    def put(self, key, grid, rooms, labels):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        height, width = grid.shape
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(CACHE_MAGIC, CACHE_LAYOUT_VERSION, nethack_map_generator.GENERATOR_VERSION,
+                                 width, height, len(rooms)))
+            f.write(np.array([(r.x1, r.y1, r.x2, r.y2) for r in rooms], dtype='<i4').tobytes())
+            f.write(np.ascontiguousarray(grid, dtype=np.uint8).tobytes())
+            f.write(np.ascontiguousarray(labels, dtype='<i4').tobytes())
+        # Atomic, so a concurrent reader never sees a half-written entry.
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pmzc"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def load_map(self, width, height, max_rooms, room_min_size, room_max_size, seed, as_array=False,
+                 with_labels=False):
+        """
+        Same contract as nethack_map_generator.create_map with a seed, served from
+        the cache when possible. With with_labels=True the component labels are
+        appended: (maze, rooms, labels). Maps without a seed are not
+        reproducible and are never cached.
+        """
+        if seed is None:
+            result = nethack_map_generator.create_map(width, height, max_rooms, room_min_size, room_max_size,
+                                                      return_array=as_array, return_labels=with_labels)
+            return result[:3]
+        key = (width, height, max_rooms, room_min_size, room_max_size, seed,
+               nethack_map_generator.GENERATOR_VERSION)
+        entry = self.get(key)
+        if entry is None:
+            grid, rooms, labels, _ = nethack_map_generator.create_map(
+                width, height, max_rooms, room_min_size, room_max_size, seed=seed,
+                return_array=True, return_labels=True)
+            try:
+                self.put(key, grid, rooms, labels)
+            except OSError as e:
+                print("Could not write map cache:", e)
+            entry = (grid, rooms, labels)
+        grid, rooms, labels = entry
+        maze = grid if as_array else nethack_map_generator.array_to_maze(grid)
+        return (maze, rooms, labels) if with_labels else (maze, rooms)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Many bots walking to the exit of one maze without running into each other.
+
+All bots share one bot_pathfinding.MazeIndex and its exit distance field.
+Collisions are avoided with windowed cooperative A* (WHCA*): every bot plans
+`window` ticks ahead in space-time, in bot order, and reserves the cells it
+will occupy at each tick so that bots planning after it route around them.
+A bot may not enter a cell reserved by another bot for that tick, nor swap
+cells with a bot coming the other way.
+
+The exit distance field is an exact heuristic for the maze without other
+bots, so each space-time search only widens where bots are in the way. Bots
+replan every window // 2 ticks, staggered by bot id, so a tick costs about
+bots / (window // 2) short searches: per-tick cost grows linearly with the
+number of bots. A bot leaves the maze when it steps onto the exit.
+
+Usage:
+    python multi_agent.py --bots 10,100,300 --size 200
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+
+import bot_pathfinding
+import nethack_map_generator
+
+class Bot:
+    def __init__(self, bot_id, cell):
+        self.bot_id = bot_id
+        self.cell = cell        # Flat cell id (see MazeIndex)
+        self.plan = []          # Cell ids for the coming ticks, next tick last
+        self.replan_at = 0
+        self.arrived_at = None  # Tick the bot stepped onto the exit
+
+class Swarm:
+    """
+    Simulation of bots moving towards the exit of index.maze, one cell per tick.
+    start_cells are (x, y) tuples; they must be distinct open cells.
+    """
+    def __init__(self, index, start_cells, window=8):
+        self.index = index
+        self.window = window
+        self.interval = max(1, window // 2)
+        self.field = index.exit_distances()
+        self.tick = 0
+        self.reserved = {}  # tick -> {cell id: bot id}
+        self.bots = [Bot(i, index.cell_id(cell)) for i, cell in enumerate(start_cells)]
+        self.active = list(self.bots)
+        self.collisions = 0
+        self.searches = 0
+        self.expansions = 0
+        # Until it has planned, every bot is taken to stand still, so the bots
+        # planning before it route around it.
+        for offset in range(window + 1):
+            slot = self.reserved.setdefault(offset, {})
+            for bot in self.bots:
+                slot[bot.cell] = bot.bot_id
+        for bot in self.bots:
+            bot.plan = [bot.cell] * window
+        # Everyone plans on the first tick, then the replans are spread out.
+        for bot in self.bots:
+            self._release(bot)
+            self._plan(bot)
+            bot.replan_at = 1 + bot.bot_id % self.interval
+
+    def _release(self, bot):
+        # Drops the bot's reservations after the current tick.
+        for offset, cell in enumerate(reversed(bot.plan), 1):
+            slot = self.reserved.get(self.tick + offset)
+            if slot is not None and slot.get(cell) == bot.bot_id:
+                del slot[cell]
+
+    def _plan(self, bot):
+        """Space-time A* from the bot's cell over the next `window` ticks."""
+        self.searches += 1
+        table = self.index.neighbor_table
+        field = self.field
+        reserved = self.reserved
+        exit_id = self.index.exit_id
+        tick = self.tick
+        window = self.window
+        bot_id = bot.bot_id
+        start = (0, bot.cell)
+        came_from = {start: None}
+        # Entries are (f, -depth, cell): ties go to the deeper state, so the
+        # search runs straight down the field when nothing is in the way.
+        frontier = [(field[bot.cell], 0, bot.cell)]
+        goal = None
+        deepest = start
+        while frontier:
+            _, depth, cell = heapq.heappop(frontier)
+            depth = -depth
+            self.expansions += 1
+            if depth == window or cell == exit_id:
+                goal = (depth, cell)
+                break
+            if depth > deepest[0]:
+                deepest = (depth, cell)
+            now = reserved.get(tick + depth, {})
+            later = reserved.get(tick + depth + 1, {})
+            for n in table[cell] + (cell,):
+                state = (depth + 1, n)
+                if state in came_from or field[n] < 0:
+                    continue
+                other = later.get(n)
+                if other is not None and other != bot_id:
+                    continue  # Cell taken at that tick.
+                other = now.get(n)
+                if other is not None and other != bot_id and later.get(cell) == other:
+                    continue  # Would swap places with another bot.
+                came_from[state] = (depth, cell)
+                heapq.heappush(frontier, (depth + 1 + field[n], -depth - 1, n))
+        plan = []
+        if goal is None:
+            # No way through the whole window: follow the longest safe prefix
+            # (or wait in place if there is none) and try again next tick.
+            goal = deepest if deepest != start else (1, bot.cell)
+            came_from.setdefault(goal, start)
+            bot.replan_at = tick + 1
+        state = goal
+        while state != start:
+            plan.append(state[1])
+            state = came_from[state]
+        plan.reverse()
+        if plan[-1] != exit_id:
+            # Keep standing on the last cell until well after the next replan,
+            # so that bot always has its old plan to fall back on.
+            end = plan[-1]
+            for offset in range(len(plan) + 1, window + self.interval + 1):
+                other = reserved.get(tick + offset, {}).get(end)
+                if other is not None and other != bot_id:
+                    break
+                plan.append(end)
+        for offset, cell in enumerate(plan, 1):
+            reserved.setdefault(tick + offset, {})[cell] = bot_id
+        plan.reverse()
+        bot.plan = plan
+
+    def step(self):
+        """Advances every bot by one tick; returns the number of bots still in the maze."""
+        self.tick += 1
+        tick = self.tick
+        exit_id = self.index.exit_id
+        occupied = {}
+        for bot in self.active:
+            previous = bot.cell
+            if bot.plan:
+                bot.cell = bot.plan.pop()
+            if bot.cell != exit_id and (bot.cell in occupied or
+                                        (bot.cell != previous and occupied.get(previous) == bot.cell)):
+                self.collisions += 1  # Same cell, or swapped places with another bot.
+            occupied[bot.cell] = previous
+        self.reserved.pop(tick - 1, None)
+        still_active = []
+        for bot in self.active:
+            if bot.cell == exit_id:
+                bot.arrived_at = tick
+                self._release(bot)
+                bot.plan = []
+            else:
+                still_active.append(bot)
+        self.active = still_active
+        for bot in self.active:
+            if bot.replan_at <= tick or not bot.plan:
+                self._release(bot)
+                self._plan(bot)
+                if bot.replan_at <= tick:
+                    bot.replan_at = tick + self.interval
+        return len(self.active)
+
+    def run(self, max_ticks=100000):
+        while self.active and self.tick < max_ticks:
+            self.step()
+        return self.tick
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many bots to the exit of one maze and time the ticks.")
+    parser.add_argument("--bots", default="10,100,300", help="comma separated bot counts")
+    parser.add_argument("--size", type=int, default=200, help="map width and height")
+    parser.add_argument("--max-rooms", type=int, default=None, help="default: size^2 / 250")
+    parser.add_argument("--window", type=int, default=8, help="planning window in ticks")
+    parser.add_argument("--ticks", type=int, default=200, help="ticks to time per run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    size = args.size
+    max_rooms = args.max_rooms or size * size // 250
+    maze, _ = nethack_map_generator.create_map(size, size, max_rooms, 3, 8, rng=random.Random(args.seed))
+    index = bot_pathfinding.MazeIndex(maze)
+    for count in (int(c) for c in args.bots.split(',')):
+        starts = index.reachable_cells(count, random.Random(args.seed))
+        start = time.perf_counter()
+        swarm = Swarm(index, starts, args.window)
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        while swarm.active and swarm.tick < args.ticks:
+            swarm.step()
+        elapsed = time.perf_counter() - start
+        ticks = max(swarm.tick, 1)
+        arrived = sum(1 for bot in swarm.bots if bot.arrived_at is not None)
+        print(f"{len(starts)} bots: setup {setup * 1000:.1f} ms, {elapsed / ticks * 1000:.2f} ms/tick "
+              f"({elapsed / ticks / len(starts) * 1e6:.1f} us per bot) over {ticks} ticks, "
+              f"{arrived} arrived, {swarm.collisions} collisions, "
+              f"{swarm.expansions / max(swarm.searches, 1):.1f} expansions per search")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,22 @@
 #!/usr/bin/env python3
 import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the array mode.
+    np = None
+
+# Bump whenever a change makes create_map produce different maps for the same
+# parameters and seed, so cached or archived maps are not mixed up.
+GENERATOR_VERSION = 1
+
+# Cell codes used by the array mode: each cell holds the ASCII value of
+# the character it has in the string map, so converting is a plain copy.
+WALL = ord('#')
+FLOOR = ord(' ')
+EXIT = ord('E')
+BLACK = ord('B')
 
 # A simple class representing a rectangular room.
 class Rect:
@@ -16,71 +33,88 @@ class Rect:
         return (self.x1 < other.x2 and self.x2 > other.x1 and
                 self.y1 < other.y2 and self.y2 > other.y1)
 
-def create_map(width, height, max_rooms, room_min_size, room_max_size, seed=None):
+    def carve_bounds(self):
+        """
+        Returns (x1, y1, x2, y2) of the area that is carved open (x2, y2 exclusive).
+        Rooms larger than 2x2 keep a one-cell wall border; smaller ones are carved fully.
+        """
+        if self.x2 - self.x1 > 2 and self.y2 - self.y1 > 2:
+            return self.x1 + 1, self.y1 + 1, self.x2 - 1, self.y2 - 1
+        return self.x1, self.y1, self.x2, self.y2
+
+    def corners(self):
+        return [(self.x1, self.y1),
+                (self.x2 - 1, self.y1),
+                (self.x1, self.y2 - 1),
+                (self.x2 - 1, self.y2 - 1)]
+
+class RoomIndex:
     """
-    Creates a dungeon map as a list of strings and returns a list of rooms.
-    
-    - Room interiors (open spaces) are carved as ' '.
-    - The room borders (including the corners) remain walls ('#').
-    - Corridors are carved out as open spaces.
-    - The exit is marked as 'E'.
-    - After carving, any wall cell that is not adjacent (cardinally)
-      to an open cell (' ' or 'E') is converted to black ('B'),
-      except if the cell is a corner of any room.
+    Bucket grid over placed rooms, used to reject overlapping candidates.
+    Each room is registered in every bucket it covers, so an overlap test only
+    looks at the rooms sharing a bucket with the candidate instead of all rooms.
     """
-    if seed is not None:
-        print("Creating map with seed:", seed)
-        # Do not re-seed here if external control is desired.
-        # random.seed(seed)
+    def __init__(self, bucket_size):
+        self.bucket_size = max(1, bucket_size)
+        self.buckets = {}
 
-    # Initialize the map filled with walls ('#').
-    map_grid = [['#' for _ in range(width)] for _ in range(height)]
+    def _keys(self, room):
+        size = self.bucket_size
+        for by in range(room.y1 // size, (room.y2 - 1) // size + 1):
+            for bx in range(room.x1 // size, (room.x2 - 1) // size + 1):
+                yield bx, by
+
+    def add(self, room):
+        for key in self._keys(room):
+            self.buckets.setdefault(key, []).append(room)
+
+    def intersects(self, room):
+        for key in self._keys(room):
+            for other in self.buckets.get(key, ()):
+                if room.intersect(other):
+                    return True
+        return False
+
+def maze_to_array(maze):
+    """Converts a list-of-strings maze into a (height, width) uint8 array of cell codes."""
+    return np.frombuffer(''.join(maze).encode('ascii'), dtype=np.uint8).reshape(len(maze), len(maze[0])).copy()
+
+def array_to_maze(grid):
+    """Converts a uint8 cell-code array back into a list of strings."""
+    return [row.tobytes().decode('ascii') for row in grid]
+
+def _place_rooms(width, height, max_rooms, room_min_size, room_max_size, rng=random):
+    """
+    Runs the random room placement, drawing numbers from rng
+    (the global random module unless a random.Random instance is given).
+    Returns the rooms and the corridors linking them as
+    (start_center, end_center, horizontal_first) tuples.
+    """
     rooms = []
+    corridors = []
+    # Buckets about one room wide keep each overlap test to a handful of rooms.
+    index = RoomIndex(max(room_max_size, 6))
 
     # Generate up to max_rooms random rooms.
     for _ in range(max_rooms):
-        w = random.randint(room_min_size, room_max_size)
-        h = random.randint(room_min_size, room_max_size)
+        w = rng.randint(room_min_size, room_max_size)
+        h = rng.randint(room_min_size, room_max_size)
         # Random position within bounds (leaving a 1-cell border).
-        x = random.randint(1, width - w - 1)
-        y = random.randint(1, height - h - 1)
+        x = rng.randint(1, width - w - 1)
+        y = rng.randint(1, height - h - 1)
         new_room = Rect(x, y, w, h)
         # Check for intersection with existing rooms.
-        if any(new_room.intersect(other) for other in rooms):
+        if index.intersects(new_room):
             continue
 
-        # Carve out the room interior while leaving a one-cell thick border.
-        if w > 2 and h > 2:
-            for i in range(new_room.y1 + 1, new_room.y2 - 1):
-                for j in range(new_room.x1 + 1, new_room.x2 - 1):
-                    map_grid[i][j] = ' '
-        else:
-            # For very small rooms, carve everything.
-            for i in range(new_room.y1, new_room.y2):
-                for j in range(new_room.x1, new_room.x2):
-                    map_grid[i][j] = ' '
-
         # Connect this room to the previous room with corridors.
         if rooms:
-            (prev_x, prev_y) = rooms[-1].center
-            (new_x, new_y) = new_room.center
-            if random.randint(0, 1):
-                # Horizontal corridor.
-                for x_corr in range(min(prev_x, new_x), max(prev_x, new_x) + 1):
-                    map_grid[prev_y][x_corr] = ' '
-                # Vertical corridor.
-                for y_corr in range(min(prev_y, new_y), max(prev_y, new_y) + 1):
-                    map_grid[y_corr][new_x] = ' '
-            else:
-                # Vertical corridor.
-                for y_corr in range(min(prev_y, new_y), max(prev_y, new_y) + 1):
-                    map_grid[y_corr][prev_x] = ' '
-                # Horizontal corridor.
-                for x_corr in range(min(prev_x, new_x), max(prev_x, new_x) + 1):
-                    map_grid[new_y][x_corr] = ' '
+            corridors.append((rooms[-1].center, new_room.center, bool(rng.randint(0, 1))))
         rooms.append(new_room)
+        index.add(new_room)
 
     # If the last room is smaller than 6x6, try adding an extra room of size 6x6.
+    # The extra room is not connected by a corridor.
     if rooms:
         last_room = rooms[-1]
         room_w = last_room.x2 - last_room.x1
@@ -89,64 +123,80 @@ def create_map(width, height, max_rooms, room_min_size, room_max_size, seed=None
             for _ in range(100):
                 w = 6
                 h = 6
-                x = random.randint(1, width - w - 1)
-                y = random.randint(1, height - h - 1)
+                x = rng.randint(1, width - w - 1)
+                y = rng.randint(1, height - h - 1)
                 new_room = Rect(x, y, w, h)
-                if not any(new_room.intersect(other) for other in rooms):
-                    for i in range(new_room.y1 + 1, new_room.y2 - 1):
-                        for j in range(new_room.x1 + 1, new_room.x2 - 1):
-                            map_grid[i][j] = ' '
+                if not index.intersects(new_room):
                     rooms.append(new_room)
-                    last_room = new_room
                     break
+    return rooms, corridors
 
-    # Mark the exit in the last room.
-    if rooms:
-        last_room = rooms[-1]
-        room_w = last_room.x2 - last_room.x1
-        room_h = last_room.y2 - last_room.y1
-        if room_w >= 6 and room_h >= 6:
-            candidates = [
-                (last_room.x1 + 1, last_room.y1 + 1),
-                (last_room.x2 - 2, last_room.y1 + 1),
-                (last_room.x1 + 1, last_room.y2 - 2),
-                (last_room.x2 - 2, last_room.y2 - 2)
-            ]
-            center = last_room.center
-            exit_x, exit_y = max(candidates, key=lambda cell: abs(cell[0] - center[0]) + abs(cell[1] - center[1]))
-        else:
-            candidates = []
-            if room_h > 2:
-                for x in range(last_room.x1 + 1, last_room.x2 - 1):
-                    candidates.append((x, last_room.y1 + 1))
-                    candidates.append((x, last_room.y2 - 2))
-            if room_w > 2:
-                for y in range(last_room.y1 + 1, last_room.y2 - 1):
-                    candidates.append((last_room.x1 + 1, y))
-                    candidates.append((last_room.x2 - 2, y))
-            if not candidates:
-                exit_x, exit_y = last_room.center
-            else:
-                center = last_room.center
-                exit_x, exit_y = min(candidates, key=lambda cell: abs(cell[0] - center[0]) + abs(cell[1] - center[1]))
-        map_grid[exit_y][exit_x] = 'E'
+def _choose_exit(last_room):
+    """Picks the exit cell inside the last room."""
+    room_w = last_room.x2 - last_room.x1
+    room_h = last_room.y2 - last_room.y1
+    center = last_room.center
+    if room_w >= 6 and room_h >= 6:
+        candidates = [
+            (last_room.x1 + 1, last_room.y1 + 1),
+            (last_room.x2 - 2, last_room.y1 + 1),
+            (last_room.x1 + 1, last_room.y2 - 2),
+            (last_room.x2 - 2, last_room.y2 - 2)
+        ]
+        return max(candidates, key=lambda cell: abs(cell[0] - center[0]) + abs(cell[1] - center[1]))
+    candidates = []
+    if room_h > 2:
+        for x in range(last_room.x1 + 1, last_room.x2 - 1):
+            candidates.append((x, last_room.y1 + 1))
+            candidates.append((x, last_room.y2 - 2))
+    if room_w > 2:
+        for y in range(last_room.y1 + 1, last_room.y2 - 1):
+            candidates.append((last_room.x1 + 1, y))
+            candidates.append((last_room.x2 - 2, y))
+    if not candidates:
+        return center
+    return min(candidates, key=lambda cell: abs(cell[0] - center[0]) + abs(cell[1] - center[1]))
+
+def _corridor_segments(corridor):
+    """
+    Splits an L-shaped corridor into its horizontal and vertical legs:
+    ((row, x_lo, x_hi), (col, y_lo, y_hi)), both ranges inclusive.
+    """
+    (prev_x, prev_y), (new_x, new_y), horizontal_first = corridor
+    x_lo, x_hi = min(prev_x, new_x), max(prev_x, new_x)
+    y_lo, y_hi = min(prev_y, new_y), max(prev_y, new_y)
+    if horizontal_first:
+        return (prev_y, x_lo, x_hi), (new_x, y_lo, y_hi)
+    return (new_y, x_lo, x_hi), (prev_x, y_lo, y_hi)
 
+def _carve_list(width, height, rooms, corridors, exit_cell):
+    # Initialize the map filled with walls ('#').
+    map_grid = [['#' for _ in range(width)] for _ in range(height)]
+    for room in rooms:
+        x1, y1, x2, y2 = room.carve_bounds()
+        for i in range(y1, y2):
+            for j in range(x1, x2):
+                map_grid[i][j] = ' '
+    for corridor in corridors:
+        (row, x_lo, x_hi), (col, y_lo, y_hi) = _corridor_segments(corridor)
+        for x_corr in range(x_lo, x_hi + 1):
+            map_grid[row][x_corr] = ' '
+        for y_corr in range(y_lo, y_hi + 1):
+            map_grid[y_corr][col] = ' '
+    if exit_cell is not None:
+        map_grid[exit_cell[1]][exit_cell[0]] = 'E'
+    return map_grid
+
+def _mark_black_list(map_grid, rooms):
+    height = len(map_grid)
+    width = len(map_grid[0])
     # Convert wall cells: if a cell is '#' and has no adjacent open cell (' ' or 'E'),
     # mark it as black ('B'), except if the cell is a room corner.
+    room_corners = {corner for room in rooms for corner in room.corners()}
     for i in range(height):
         for j in range(width):
             if map_grid[i][j] == '#':
-                # Check if this cell is a corner of any room.
-                is_room_corner = False
-                for room in rooms:
-                    corners = [(room.x1, room.y1),
-                               (room.x2 - 1, room.y1),
-                               (room.x1, room.y2 - 1),
-                               (room.x2 - 1, room.y2 - 1)]
-                    if (j, i) in corners:
-                        is_room_corner = True
-                        break
-                if is_room_corner:
+                if (j, i) in room_corners:
                     continue
                 adjacent_open = False
                 for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
@@ -157,8 +207,148 @@ def create_map(width, height, max_rooms, room_min_size, room_max_size, seed=None
                             break
                 if not adjacent_open:
                     map_grid[i][j] = 'B'
-    
-    maze = [''.join(row) for row in map_grid]
+
+
+def _carve_array(width, height, rooms, corridors, exit_cell):
+    grid = np.full((height, width), WALL, dtype=np.uint8)
+    for room in rooms:
+        x1, y1, x2, y2 = room.carve_bounds()
+        grid[y1:y2, x1:x2] = FLOOR
+    for corridor in corridors:
+        (row, x_lo, x_hi), (col, y_lo, y_hi) = _corridor_segments(corridor)
+        grid[row, x_lo:x_hi + 1] = FLOOR
+        grid[y_lo:y_hi + 1, col] = FLOOR
+    if exit_cell is not None:
+        grid[exit_cell[1], exit_cell[0]] = EXIT
+    return grid
+
+def _mark_black_array(grid, rooms):
+    # Same wall-to-'B' rule as the list mode, as a single neighbour/corner mask.
+    is_open = (grid == FLOOR) | (grid == EXIT)
+    adjacent_open = np.zeros_like(is_open)
+    adjacent_open[1:, :] |= is_open[:-1, :]
+    adjacent_open[:-1, :] |= is_open[1:, :]
+    adjacent_open[:, 1:] |= is_open[:, :-1]
+    adjacent_open[:, :-1] |= is_open[:, 1:]
+    room_corner = np.zeros_like(is_open)
+    if rooms:
+        corners = np.array([room.corners() for room in rooms]).reshape(-1, 2)
+        room_corner[corners[:, 1], corners[:, 0]] = True
+    grid[(grid == WALL) & ~adjacent_open & ~room_corner] = BLACK
+
+def label_components(grid):
+    """
+    Labels the 4-connected components of open cells (' ' and 'E') in a uint8 grid.
+    Returns (labels, sizes): labels is an int32 grid with 0 for closed cells and
+    1..n for open ones, sizes[k] is the cell count of component k (sizes[0] == 0).
+
+    Horizontal runs of open cells are found with array operations; only runs that
+    touch vertically are joined with a union-find, so the Python work scales with
+    the number of runs, not the number of cells.
+    """
+    height, width = grid.shape
+    is_open = (grid == FLOOR) | (grid == EXIT)
+    run_start = is_open.copy()
+    run_start[:, 1:] &= ~is_open[:, :-1]
+    # Run index of every cell (only meaningful where is_open is set).
+    run_of_cell = np.cumsum(run_start.ravel()).reshape(height, width) - 1
+    run_count = int(run_start.sum())
+
+    parent = list(range(run_count))
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    touching = is_open[:-1, :] & is_open[1:, :]
+    if touching.any():
+        keys = np.unique(run_of_cell[:-1, :][touching] * run_count + run_of_cell[1:, :][touching])
+        for a, b in zip((keys // run_count).tolist(), (keys % run_count).tolist()):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find(a) for a in range(run_count)], dtype=np.int64)
+    _, component_of_run = np.unique(roots, return_inverse=True)
+    labels = np.zeros((height, width), dtype=np.int32)
+    labels[is_open] = component_of_run[run_of_cell[is_open]] + 1
+    sizes = np.bincount(labels.ravel(), minlength=int(labels.max()) + 1)
+    sizes[0] = 0
+    return labels, sizes
+
+def create_map(width, height, max_rooms, room_min_size, room_max_size, seed=None,
+               array_mode=False, return_array=False, rng=None, return_labels=False,
+               timings=None):
+    """
+    Creates a dungeon map as a list of strings and returns a list of rooms.
+
+    - Room interiors (open spaces) are carved as ' '.
+    - The room borders (including the corners) remain walls ('#').
+    - Corridors are carved out as open spaces.
+    - The exit is marked as 'E'.
+    - After carving, any wall cell that is not adjacent (cardinally)
+      to an open cell (' ' or 'E') is converted to black ('B'),
+      except if the cell is a corner of any room.
+
+    With array_mode=True the grid is built as a NumPy uint8 array of cell codes
+    (WALL, FLOOR, EXIT, BLACK) using slice assignments and a vectorized wall pass.
+    The result is identical to the list mode for the same random state.
+    With return_array=True (implies array_mode) the raw array is returned instead
+    of the list of strings.
+
+    Random numbers come from rng (a random.Random instance) if given; otherwise a
+    seed creates a private random.Random(seed), so the same seed always gives the
+    same map. Without either the global random module is used.
+
+    With return_labels=True the connected-component labels of the open cells are
+    appended to the result: (maze, rooms, labels, sizes), see label_components.
+    Two cells are mutually reachable exactly when their labels are equal and nonzero.
+
+    If a dict is passed as timings, the wall time in seconds of each phase is
+    stored in it under 'placement', 'exit', 'carving', 'walls' (and 'labels').
+    """
+    if rng is None:
+        if seed is not None:
+            print("Creating map with seed:", seed)
+            rng = random.Random(seed)
+        else:
+            rng = random
+
+    clock = time.perf_counter
+    t_start = clock()
+    rooms, corridors = _place_rooms(width, height, max_rooms, room_min_size, room_max_size, rng)
+    t_placed = clock()
+
+    # Mark the exit in the last room.
+    exit_cell = _choose_exit(rooms[-1]) if rooms else None
+    t_exit = clock()
+
+    if not (array_mode or return_array or return_labels):
+        map_grid = _carve_list(width, height, rooms, corridors, exit_cell)
+        t_carved = clock()
+        _mark_black_list(map_grid, rooms)
+        maze = [''.join(row) for row in map_grid]
+        t_walls = clock()
+    else:
+        if np is None:
+            raise ImportError("array_mode, return_array and return_labels require NumPy")
+        grid = _carve_array(width, height, rooms, corridors, exit_cell)
+        t_carved = clock()
+        _mark_black_array(grid, rooms)
+        maze = grid if return_array else array_to_maze(grid)
+        t_walls = clock()
+    if timings is not None:
+        timings['placement'] = t_placed - t_start
+        timings['exit'] = t_exit - t_placed
+        timings['carving'] = t_carved - t_exit
+        timings['walls'] = t_walls - t_carved
+
+    if return_labels:
+        labels, sizes = label_components(grid)
+        if timings is not None:
+            timings['labels'] = clock() - t_walls
+        return maze, rooms, labels, sizes
     return maze, rooms
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""
+Bot path planning off the render loop.
+
+PlannerService runs bot_pathfinding searches in a worker process, so the
+game keeps rendering at full frame rate while a long search runs. The pool is
+a process pool rather than threads: the searches are pure Python and hold
+the GIL, and every PyOpenGL call in the render loop releases and then waits
+to take it back, so a search thread would still stall the frames. Workers
+are spawned (not forked from a process that already runs GLFW, GL and
+threads), and only once the first request comes in.
+
+    service = PlannerService()
+    service.submit("astar", (x, y), maze, rooms)
+    ...
+    for chunk in service.poll():  # once per frame: the pieces of path that arrived
+        ...
+    if not service.pending():     # the whole path is in; service.stats is its SearchStats
+        ...
+
+The path is streamed: the worker walks bot_pathfinding.iter_exit_path (or
+iter_exit_dstar) and sends what it has every FLUSH_INTERVAL seconds, so a
+bot can start on the first legs of an EXPLORE tour or HPA route while the
+rest is still being planned. Single-search algorithms arrive in one piece.
+
+Each request carries the maze rows. A worker keeps the MazeIndex (and, for
+"dstar", the DStarLite planner) of the last maze it was sent and patches
+both with MazeIndex.set_cells when a later maze differs in a few cells, so
+edits to a dynamic map are repaired rather than searched from scratch.
+
+submit_field asks the worker for the maze's exit distance field instead,
+for FIELD mode, which steers by it on the game's side; it comes back from
+poll() as one chunk.
+
+Submitting a request, or calling cancel() (e.g. on reset), makes the earlier
+ones stale: a queued request is cancelled (or skipped when it starts), a
+running one gives up at its next check, and whatever it already sent is
+dropped.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import queue
+import time
+
+import bot_pathfinding
+
+# A maze with more differing rows than this fraction is indexed from scratch
+# instead of patched cell by cell.
+REBUILD_FRACTION = 0.25
+# Seconds of planning between two chunks sent back to the game.
+FLUSH_INTERVAL = 0.02
+# Expansions between two checks that a running search is still wanted.
+CHECK_INTERVAL = 1024
+
+_results = None  # Queue of (ticket, chunk, final) messages back to the game
+_current = None  # Shared ticket of the newest request
+_index = None    # MazeIndex of the last maze this worker was sent
+_planner = None  # DStarLite over _index, kept for "dstar" requests
+
+class _Superseded(Exception):
+    pass
+
+class _WatchedStats(bot_pathfinding.SearchStats):
+    # SearchStats that gives up on the search (raises _Superseded) once a
+    # newer request has been submitted, checked every CHECK_INTERVAL
+    # expansions wherever the search counts them, and at every checkpoint of
+    # the per-maze builds. It leaves shortest_length at -1 unless the exit
+    # distance field already exists, rather than run a full BFS per request.
+    def __init__(self, ticket):
+        self.ticket = ticket
+        self._expansions = 0
+        super().__init__(shortest=False)
+
+    def checkpoint(self):
+        if _current.value != self.ticket:
+            raise _Superseded
+
+    @property
+    def expansions(self):
+        return self._expansions
+
+    @expansions.setter
+    def expansions(self, value):
+        if value // CHECK_INTERVAL != self._expansions // CHECK_INTERVAL and _current.value != self.ticket:
+            raise _Superseded
+        self._expansions = value
+
+def _start_worker(results, current):
+    global _results, _current
+    _results = results
+    _current = current
+
+def _sync_index(maze):
+    """Brings the worker's MazeIndex in line with maze; returns it."""
+    global _index, _planner
+    index = _index
+    if index is not None and index.rows == len(maze) and index.cols == len(maze[0]):
+        rows = [y for y, (old, new) in enumerate(zip(index.maze, maze)) if old != new]
+        if len(rows) <= REBUILD_FRACTION * index.rows:
+            changes = [((x, y), ch) for y in rows
+                       for x, (old, ch) in enumerate(zip(index.maze[y], maze[y])) if old != ch]
+            if changes:
+                changed = index.set_cells(changes)
+                if _planner is not None:
+                    _planner.update(changed)
+            return index
+    _index = bot_pathfinding.MazeIndex(list(maze))
+    _planner = None
+    return _index
+
+def _plan(algorithm, start, maze, rooms, heading, ticket):
+    # Runs in the worker process.
+    global _planner
+    if _current.value != ticket:
+        return  # Superseded while it was queued.
+    index = _sync_index(maze)
+    cache = bot_pathfinding.path_cache
+    if algorithm == "dstar" and index.exit_id is not None:
+        # Plain stats: stopping DStarLite halfway through an expansion would
+        # leave its queue inconsistent for the next request. Its walk is
+        # still checked between cells below.
+        stats = bot_pathfinding.SearchStats()
+        if _planner is None or _planner.goal_id != index.exit_id:
+            _planner = bot_pathfinding.DStarLite(index, start)
+        _planner.stats = stats
+        stats.algorithm = "dstar"
+        _planner.move_to(start)
+        stats.shortest_length = _planner.distance()
+        steps = bot_pathfinding.iter_exit_dstar(_planner)
+    else:
+        stats = _WatchedStats(ticket)
+        steps = bot_pathfinding.iter_exit_path(algorithm, bot_pathfinding.CellPosition(start), index.maze,
+                                               rooms, index, cache, stats, heading)
+    if heading is not None:
+        stats.episode_time = 0.0
+    chunk = []
+    last = None  # Last cell already sent; the next chunk carries on from it
+
+    def send(final=None):
+        # Puts chunk on the queue: the cells themselves, or with a heading
+        # their compile_commands stream, continuing from last.
+        nonlocal chunk, last, heading
+        if heading is None:
+            _results.put((ticket, chunk, final))
+            last = chunk[-1] if chunk else last
+        else:
+            path = chunk if last is None else [last] + chunk
+            commands = bot_pathfinding.compile_commands(path, heading)
+            stats.episode_time += bot_pathfinding.episode_time(commands)
+            _results.put((ticket, commands, final))
+            if len(path) > 1:
+                (x, y), (nx, ny) = path[-2], path[-1]
+                heading = bot_pathfinding.HEADING_STEPS.index((nx - x, ny - y))
+            last = path[-1] if path else last
+        chunk = []
+
+    clock = time.perf_counter
+    flushed = clock()
+    cells = 0
+    try:
+        for cell in steps:
+            chunk.append(cell)
+            cells += 1
+            if clock() - flushed >= FLUSH_INTERVAL:
+                if _current.value != ticket:
+                    return
+                if len(chunk) > 1 or last is not None:
+                    send()
+                flushed = clock()
+    except _Superseded:
+        return
+    stats.path_length = max(cells - 1, 0)  # Cached paths are replayed without counting them.
+    send((stats, (cache.hits, cache.suffix_hits, cache.misses)))
+
+def _build_field(maze, ticket):
+    # Runs in the worker process.
+    if _current.value != ticket:
+        return
+    index = _sync_index(maze)
+    cache = bot_pathfinding.path_cache
+    _results.put((ticket, index.exit_distances(), (None, (cache.hits, cache.suffix_hits, cache.misses))))
+
+class PlannerService:
+    """
+    Runs bot searches in `workers` processes (one is enough for a single bot,
+    and keeps every request on the same cached MazeIndex).
+    stats and cache_counters are the SearchStats and the worker PathCache's
+    (hits, suffix hits, misses) of the last request whose path poll() has
+    handed over in full.
+    """
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.executor = None  # Started by the first submit()
+        self.results = None
+        self.current = None
+        self.future = None
+        self.generation = 0
+        self.stats = None
+        self.cache_counters = (0, 0, 0)
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self.results = context.Queue()
+        self.current = context.Value('q', self.generation)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=_start_worker, initargs=(self.results, self.current))
+
+    def submit(self, algorithm, start, maze, rooms, heading=None):
+        """
+        Queues a search for the exit from the (x, y) start cell and returns
+        its Future. The path comes back through poll() as lists of cells, or
+        with a heading (0-3, see bot_pathfinding.HEADING_STEPS) as a
+        compile_commands stream for a bot facing that way.
+        """
+        self.cancel()
+        if self.executor is None:
+            self._start()
+        self.stats = None
+        self.future = self.executor.submit(_plan, algorithm, tuple(start), list(maze), rooms, heading,
+                                           self.generation)
+        return self.future
+
+    def submit_field(self, maze):
+        """
+        Queues a build of maze's exit distance field (see
+        bot_pathfinding.MazeIndex.exit_distances) and returns its Future.
+        poll() hands the field over as a single chunk; stats stays None.
+        """
+        self.cancel()
+        if self.executor is None:
+            self._start()
+        self.stats = None
+        self.future = self.executor.submit(_build_field, list(maze), self.generation)
+        return self.future
+
+    def poll(self):
+        """
+        The chunks of the current request that arrived since the last call,
+        in order ([] if none). Each carries on where the previous one ended;
+        once the last one has been returned, pending() is False.
+        """
+        chunks = []
+        future = self.future
+        if future is None:
+            return chunks
+        while True:
+            try:
+                ticket, chunk, final = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if ticket != self.generation:
+                continue  # Sent for a request that has since been superseded.
+            chunks.append(chunk)
+            if final is not None:
+                self.stats, self.cache_counters = final
+                self.future = None
+                return chunks
+        if future.done() and future.exception() is not None:
+            self.future = None
+            future.result()  # Raises the worker's error.
+        return chunks
+
+    def pending(self):
+        """Whether the current request still has path to send."""
+        return self.future is not None
+
+    def cancel(self):
+        """Makes every outstanding request stale."""
+        self.generation += 1
+        if self.current is not None:
+            self.current.value = self.generation
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+
+    def shutdown(self):
+        # cancel() makes a running search give up, so waiting for it is short.
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
@@ -2,6 +2,8 @@
 import random
 import nethack_map_generator  # Updated map generation module
 import bot_pathfinding         # Updated pathfinding module
+import planner_service         # Runs bot searches in a worker process
+import map_cache               # On-disk cache of generated maps
 import glfw
 from OpenGL.GL import *
 from OpenGL.GLU import *
@@ -12,7 +14,6 @@ from PIL import Image
 import math
 import ctypes
 import sys
-import time
 from collections import deque
 
 # --- Global Variables for 3D Maze Geometry ---
@@ -24,10 +25,25 @@ wall_brick_vbo = None
 wall_brick_vertex_count = 0
 wall_exit_vbo = None
 wall_exit_vertex_count = 0
+# Index buffers and index counts, used when the geometry comes from build_greedy_geometry.
+floor_ibo = None
+floor_index_count = 0
+ceiling_ibo = None
+ceiling_index_count = 0
+wall_brick_ibo = None
+wall_brick_index_count = 0
+wall_exit_ibo = None
+wall_exit_index_count = 0
+greedy_meshing = True  # Merge floor, ceiling and wall faces into large indexed quads
+g_toggle_pressed = False
+x_toggle_pressed = False
 
 # --- Maze Data from nethack_map_generator ---
 maze = []      # Maze is a list of strings (each cell is a character)
 rooms = []
+maze_labels = None  # Connected-component label per cell (see nethack_map_generator.label_components)
+maze_index = None   # bot_pathfinding.MazeIndex shared by every bot search on this maze
+level_cache = map_cache.MapCache()
 
 # --- Player State (player_pos.x = column, player_pos.z = row) ---
 player_pos = None
@@ -36,7 +52,7 @@ is_moving = False
 start_pos = None
 target_pos = None
 move_progress = 0.0
-move_duration = 0.2
+move_duration = 0.2  # Keep in step with bot_pathfinding.MOVE_TIME / TURN_TIME
 is_turning = False
 start_angle = 0.0
 target_angle = 0.0
@@ -65,9 +81,15 @@ max_corridor_discovery_depth = 20
 # --- Bot Variables ---
 bot_mode = False
 b_toggle_pressed = False
-selected_algorithm = "bfs"  # Options: "bfs", "dfs", "astar", "explore"
-bot_path = []
-bot_path_index = 0
+selected_algorithm = "bfs"  # Options: "bfs", "dfs", "astar", "explore", "field", "jps", "hpa", "bibfs", "biastar", "dstar", "timed"
+bot_commands = bot_pathfinding.CommandQueue()  # Bot commands streamed in from path_planner
+bot_step = None      # Command taken from bot_commands that the bot is about to carry out
+bot_origin = None    # (cell, heading) the requested command stream starts from
+last_search_stats = None  # bot_pathfinding.SearchStats of the path behind bot_commands
+bot_stats_logged = False  # Whether last_search_stats was printed once the path ran out
+bot_field = None     # Exit distance field FIELD mode steers by, built by path_planner
+bot_waiting = False  # Whether a bot path was requested from path_planner and none of it has arrived yet
+path_planner = planner_service.PlannerService()
 unstuck_mode = False
 unstuck_attempts = 0
 
@@ -119,6 +141,33 @@ def find_nearest_floor(x, y, maze):
                 queue.append((nx, ny))
     return x, y
 
+def spawn_candidates(room):
+    # Use interior candidates if room is large enough (to avoid walls).
+    if (room.x2 - room.x1) > 2 and (room.y2 - room.y1) > 2:
+        return [
+            (room.x1 + 1, room.y1 + 1),
+            (room.x2 - 2, room.y1 + 1),
+            (room.x1 + 1, room.y2 - 2),
+            (room.x2 - 2, room.y2 - 2)
+        ]
+    return [room.center]
+
+def choose_spawn(rooms, labels, exit_label):
+    """
+    Picks a spawn cell inside a room other than the exit's (the last one)
+    that shares the exit's component label. None if no such room exists.
+    """
+    if not exit_label:
+        return None
+    connected = []
+    for room in rooms[:-1]:
+        cells = [cell for cell in spawn_candidates(room) if labels[cell[1], cell[0]] == exit_label]
+        if cells:
+            connected.append(cells)
+    if not connected:
+        return None
+    return random.choice(random.choice(connected))
+
 def get_area_type(x, y, rooms):
     for room in rooms:
         if room.x1 <= x < room.x2 and room.y1 <= y < room.y2:
@@ -161,79 +210,146 @@ def cursor_position_callback(window, xpos, ypos):
         full_map_offset_y -= dy
         prev_mouse_x, prev_mouse_y = xpos, ypos
 
+# Vertex templates for the quads build_maze_geometry emits: six vertices of
+# (x, y, z, u, v), with x and z relative to the cell's corner.
+FLOOR_QUAD = np.array([
+    [0, 0, 0, 0, 0], [1, 0, 0, 1, 0], [1, 0, 1, 1, 1],
+    [0, 0, 0, 0, 0], [1, 0, 1, 1, 1], [0, 0, 1, 0, 1],
+], dtype=np.float32)
+CEILING_QUAD = FLOOR_QUAD + np.array([0, 1, 0, 0, 0], dtype=np.float32)
+# Wall faces in the order they are emitted for a cell: towards z-1, z+1, x-1, x+1.
+WALL_QUADS = np.array([
+    [[0, 0, 0, 0, 0], [1, 0, 0, 1, 0], [1, 1, 0, 1, 1], [0, 0, 0, 0, 0], [1, 1, 0, 1, 1], [0, 1, 0, 0, 1]],
+    [[0, 0, 1, 0, 0], [1, 0, 1, 1, 0], [1, 1, 1, 1, 1], [0, 0, 1, 0, 0], [1, 1, 1, 1, 1], [0, 1, 1, 0, 1]],
+    [[0, 0, 0, 0, 0], [0, 0, 1, 1, 0], [0, 1, 1, 1, 1], [0, 0, 0, 0, 0], [0, 1, 1, 1, 1], [0, 1, 0, 0, 1]],
+    [[1, 0, 0, 0, 0], [1, 0, 1, 1, 0], [1, 1, 1, 1, 1], [1, 0, 0, 0, 0], [1, 1, 1, 1, 1], [1, 1, 0, 0, 1]],
+], dtype=np.float32)
+
+def place_quads(quads, x, z):
+    """Flat interleaved float32 vertex data: quad i (or the single quad given) moved to cell (x[i], z[i])."""
+    vertices = np.empty((len(x), 6, 5), dtype=np.float32)
+    vertices[:] = quads
+    vertices[:, :, 0] += x[:, None]
+    vertices[:, :, 2] += z[:, None]
+    return vertices.reshape(-1)
+
+def wall_face_masks():
+    """
+    Masks over the maze grid: wall cells ('#', 'B' and the exit 'E'), their
+    exposed faces (rows, cols, 4) in emitting order, and the exit cell
+    (rows, cols, 1). A wall face is exposed if it borders an open cell or the
+    edge of the map.
+    """
+    rows = len(maze)
+    cols = len(maze[0])
+    grid = np.frombuffer(''.join(maze).encode('ascii'), dtype=np.uint8).reshape(rows, cols)
+    wall = np.isin(grid, np.frombuffer(b'#BE', dtype=np.uint8))
+    # Padded with open cells, so faces on the map's edge are kept.
+    padded = np.zeros((rows + 2, cols + 2), dtype=bool)
+    padded[1:-1, 1:-1] = wall
+    faces = np.stack([~padded[:-2, 1:-1], ~padded[2:, 1:-1],
+                      ~padded[1:-1, :-2], ~padded[1:-1, 2:]], axis=-1)
+    faces &= wall[:, :, None]
+    return wall, faces, (grid == ord('E'))[:, :, None]
+
 def build_maze_geometry():
-    global maze
-    floor_vertices = []
-    ceiling_vertices = []
-    wall_brick_vertices = []
-    wall_exit_vertices = []
+    """
+    Vertex data for the floor, ceiling, brick walls and exit walls as flat
+    float32 arrays of per-cell quads, in cell order (row by row).
+    """
     rows = len(maze)
     cols = len(maze[0])
-    for z in range(rows):
-        for x in range(cols):
-            floor_vertices.extend([
-                x, 0.0, z,   0.0, 0.0,
-                x+1, 0.0, z, 1.0, 0.0,
-                x+1, 0.0, z+1, 1.0, 1.0,
-                x, 0.0, z,   0.0, 0.0,
-                x+1, 0.0, z+1, 1.0, 1.0,
-                x, 0.0, z+1, 0.0, 1.0,
-            ])
-            ceiling_vertices.extend([
-                x, 1.0, z,   0.0, 0.0,
-                x+1, 1.0, z, 1.0, 0.0,
-                x+1, 1.0, z+1, 1.0, 1.0,
-                x, 1.0, z,   0.0, 0.0,
-                x+1, 1.0, z+1, 1.0, 1.0,
-                x, 1.0, z+1, 0.0, 1.0,
-            ])
-            cell = maze[z][x]
-            # Treat '#' and 'B' as walls, and 'E' as exit wall.
-            if cell in ('#', 'B', 'E'):
-                if z == 0 or maze[z-1][x] not in ('#','B','E'):
-                    target_list = wall_exit_vertices if cell == "E" else wall_brick_vertices
-                    target_list.extend([
-                        x, 0.0, z,   0.0, 0.0,
-                        x+1, 0.0, z, 1.0, 0.0,
-                        x+1, 1.0, z, 1.0, 1.0,
-                        x, 0.0, z,   0.0, 0.0,
-                        x+1, 1.0, z, 1.0, 1.0,
-                        x, 1.0, z,   0.0, 1.0,
-                    ])
-                if z == len(maze)-1 or maze[z+1][x] not in ('#','B','E'):
-                    target_list = wall_exit_vertices if cell == "E" else wall_brick_vertices
-                    target_list.extend([
-                        x, 0.0, z+1,   0.0, 0.0,
-                        x+1, 0.0, z+1, 1.0, 0.0,
-                        x+1, 1.0, z+1, 1.0, 1.0,
-                        x, 0.0, z+1,   0.0, 0.0,
-                        x+1, 1.0, z+1, 1.0, 1.0,
-                        x, 1.0, z+1,   0.0, 1.0,
-                    ])
-                if x == 0 or maze[z][x-1] not in ('#','B','E'):
-                    target_list = wall_exit_vertices if cell == "E" else wall_brick_vertices
-                    target_list.extend([
-                        x, 0.0, z,   0.0, 0.0,
-                        x, 0.0, z+1, 1.0, 0.0,
-                        x, 1.0, z+1, 1.0, 1.0,
-                        x, 0.0, z,   0.0, 0.0,
-                        x, 1.0, z+1, 1.0, 1.0,
-                        x, 1.0, z,   0.0, 1.0,
-                    ])
-                if x == len(maze[0])-1 or maze[z][x+1] not in ('#','B','E'):
-                    target_list = wall_exit_vertices if cell == "E" else wall_brick_vertices
-                    target_list.extend([
-                        x+1, 0.0, z,   0.0, 0.0,
-                        x+1, 0.0, z+1, 1.0, 0.0,
-                        x+1, 1.0, z+1, 1.0, 1.0,
-                        x+1, 0.0, z,   0.0, 0.0,
-                        x+1, 1.0, z+1, 1.0, 1.0,
-                        x+1, 1.0, z,   0.0, 1.0,
-                    ])
+    wall, faces, is_exit = wall_face_masks()
+    z, x = np.divmod(np.arange(rows * cols), cols)
+    floor_vertices = place_quads(FLOOR_QUAD, x, z)
+    ceiling_vertices = place_quads(CEILING_QUAD, x, z)
+    # nonzero walks (z, x, face) in C order, which is the emitting order.
+    z, x, face = np.nonzero(faces & ~is_exit)
+    wall_brick_vertices = place_quads(WALL_QUADS[face], x, z)
+    z, x, face = np.nonzero(faces & is_exit)
+    wall_exit_vertices = place_quads(WALL_QUADS[face], x, z)
     return (floor_vertices, ceiling_vertices, wall_brick_vertices, wall_exit_vertices)
 
+def merged_runs(mask):
+    """(row, start, end) of every horizontal run of True cells in a 2D mask, row by row."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    steps = np.diff(padded, axis=1)
+    row, start = np.nonzero(steps == 1)
+    _, end = np.nonzero(steps == -1)
+    return row, start, end
+
+def merged_rectangles(mask):
+    """
+    Covers the True cells of a 2D mask with rectangles (row0, row1, col0,
+    col1), end exclusive: horizontal runs, stacked while the next row has a
+    run with the same span.
+    """
+    row, start, end = merged_runs(mask)
+    order = np.lexsort((row, end, start))
+    row, start, end = row[order], start[order], end[order]
+    first = np.ones(len(row), dtype=bool)
+    first[1:] = (start[1:] != start[:-1]) | (end[1:] != end[:-1]) | (row[1:] != row[:-1] + 1)
+    firsts = np.nonzero(first)[0]
+    lasts = np.append(firsts[1:], len(row)) - 1
+    return row[firsts], row[lasts] + 1, start[firsts], end[firsts]
+
+def indexed_quads(corners, width, height):
+    """
+    Vertex and index data for quads given as corners (n, 4, 3) in the order
+    (0, 0), (1, 0), (1, 1), (0, 1) of the texture, which repeats width times
+    across and height times up.
+    """
+    count = len(corners)
+    vertices = np.empty((count, 4, 5), dtype=np.float32)
+    vertices[:, :, :3] = corners
+    vertices[:, :, 3] = np.array([0, 1, 1, 0]) * width[:, None]
+    vertices[:, :, 4] = np.array([0, 0, 1, 1]) * height[:, None]
+    # Same triangles as the per-cell quads: (0, 1, 2) and (0, 2, 3).
+    indices = np.arange(count, dtype=np.uint32)[:, None] * 4 + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+    return vertices.reshape(-1), indices.reshape(-1)
+
+def quad_corners(*vertices):
+    """(n, 4, 3) quad corners from four (x, y, z) vertices whose parts are arrays or scalars."""
+    return np.stack([np.stack(np.broadcast_arrays(*vertex), -1) for vertex in vertices], 1)
+
+def greedy_floor(mask, y):
+    z0, z1, x0, x1 = merged_rectangles(mask)
+    return indexed_quads(quad_corners((x0, y, z0), (x1, y, z0), (x1, y, z1), (x0, y, z1)), x1 - x0, z1 - z0)
+
+def greedy_walls(faces):
+    """Indexed quads for exposed wall faces, a (rows, cols, 4) mask as from wall_face_masks."""
+    corners = []
+    lengths = []
+    for face, offset in ((0, 0), (1, 1)):
+        # Faces towards z-1 / z+1 lie in the plane z = row (+ 1) and merge along x.
+        z, x0, x1 = merged_runs(faces[:, :, face])
+        z = z + offset
+        corners.append(quad_corners((x0, 0, z), (x1, 0, z), (x1, 1, z), (x0, 1, z)))
+        lengths.append(x1 - x0)
+    for face, offset in ((2, 0), (3, 1)):
+        # Faces towards x-1 / x+1 lie in the plane x = column (+ 1) and merge along z.
+        x, z0, z1 = merged_runs(faces[:, :, face].T)
+        x = x + offset
+        corners.append(quad_corners((x, 0, z0), (x, 0, z1), (x, 1, z1), (x, 1, z0)))
+        lengths.append(z1 - z0)
+    lengths = np.concatenate(lengths)
+    return indexed_quads(np.concatenate(corners), lengths, np.ones_like(lengths))
+
+def build_greedy_geometry():
+    """
+    Like build_maze_geometry, but as (vertices, indices) pairs of merged
+    quads: floor and ceiling only under open cells (the rest is inside
+    walls), merged into rectangles, and wall faces merged into runs along
+    each wall. Texture coordinates count cells, so with GL_REPEAT the
+    textures tile exactly as on per-cell quads.
+    """
+    wall, faces, is_exit = wall_face_masks()
+    return (greedy_floor(~wall, 0), greedy_floor(~wall, 1),
+            greedy_walls(faces & ~is_exit), greedy_walls(faces & is_exit))
+
 def create_vbo(vertex_data):
-    arr = np.array(vertex_data, dtype=np.float32)
+    arr = np.asarray(vertex_data, dtype=np.float32)
     vbo_id = glGenBuffers(1)
     glBindBuffer(GL_ARRAY_BUFFER, vbo_id)
     glBufferData(GL_ARRAY_BUFFER, arr.nbytes, arr, GL_STATIC_DRAW)
@@ -241,10 +357,29 @@ def create_vbo(vertex_data):
     vertex_count = len(vertex_data) // 5
     return vbo_id, vertex_count
 
+def create_ibo(index_data):
+    arr = np.asarray(index_data, dtype=np.uint32)
+    ibo_id = glGenBuffers(1)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo_id)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, arr.nbytes, arr, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    return ibo_id, len(arr)
+
 def rebuild_geometry():
     global floor_vbo, floor_vertex_count, ceiling_vbo, ceiling_vertex_count
     global wall_brick_vbo, wall_brick_vertex_count, wall_exit_vbo, wall_exit_vertex_count
-    floor_data, ceiling_data, wall_brick_data, wall_exit_data = build_maze_geometry()
+    global floor_ibo, floor_index_count, ceiling_ibo, ceiling_index_count
+    global wall_brick_ibo, wall_brick_index_count, wall_exit_ibo, wall_exit_index_count
+    if greedy_meshing:
+        ((floor_data, floor_indices), (ceiling_data, ceiling_indices),
+         (wall_brick_data, wall_brick_indices), (wall_exit_data, wall_exit_indices)) = build_greedy_geometry()
+    else:
+        floor_data, ceiling_data, wall_brick_data, wall_exit_data = build_maze_geometry()
+        floor_indices = ceiling_indices = wall_brick_indices = wall_exit_indices = None
+    for ibo in (floor_ibo, ceiling_ibo, wall_brick_ibo, wall_exit_ibo):
+        if ibo:
+            glDeleteBuffers(1, [ibo])
+    floor_ibo = ceiling_ibo = wall_brick_ibo = wall_exit_ibo = None
     if floor_vbo:
         glDeleteBuffers(1, [floor_vbo])
     floor_vbo, floor_vertex_count = create_vbo(floor_data)
@@ -257,13 +392,94 @@ def rebuild_geometry():
     if wall_exit_vbo:
         glDeleteBuffers(1, [wall_exit_vbo])
     wall_exit_vbo, wall_exit_vertex_count = create_vbo(wall_exit_data)
-    print("Geometry rebuilt: floor =", floor_vertex_count, "walls =", wall_brick_vertex_count + wall_exit_vertex_count)
+    if greedy_meshing:
+        floor_ibo, floor_index_count = create_ibo(floor_indices)
+        ceiling_ibo, ceiling_index_count = create_ibo(ceiling_indices)
+        wall_brick_ibo, wall_brick_index_count = create_ibo(wall_brick_indices)
+        wall_exit_ibo, wall_exit_index_count = create_ibo(wall_exit_indices)
+    print("Geometry rebuilt" + (" (greedy meshing)" if greedy_meshing else "") + ": floor =", floor_vertex_count,
+          "walls =", wall_brick_vertex_count + wall_exit_vertex_count)
+
+def draw_mesh(texture, vbo, vertex_count, ibo, index_count):
+    """Draws one textured mesh: indexed when it has an index buffer, else as plain triangles."""
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 5*4, ctypes.c_void_p(0))
+    glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+    glTexCoordPointer(2, GL_FLOAT, 5*4, ctypes.c_void_p(3*4))
+    if ibo:
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+        glDrawElements(GL_TRIANGLES, index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    else:
+        glDrawArrays(GL_TRIANGLES, 0, vertex_count)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
 
 def draw_text(x, y, text):
     glWindowPos2i(int(x), int(y))
     for ch in text:
         glutBitmapCharacter(GLUT_BITMAP_8_BY_13, ord(ch))
 
+def current_origin():
+    """The player's cell (the one it is moving into, if it is moving) and heading (0-3)."""
+    cell_pos = target_pos if is_moving else player_pos
+    return (int(cell_pos.x), int(cell_pos.z)), round(player_angle_deg / 90) % 4
+
+def request_bot_path():
+    """
+    Asks path_planner for a new bot path, as a command stream from the
+    player's current cell and heading. The game keeps running while the bot
+    waits for it; the main loop feeds the chunks path_planner.poll() hands
+    over into bot_commands, and the bot sets off with the first one.
+    """
+    global bot_commands, bot_step, bot_waiting, bot_origin, bot_stats_logged, last_search_stats, bot_field
+    last_search_stats = None  # Described the path being replaced
+    if selected_algorithm == "field":
+        # FIELD needs no plan, only the exit distance field it steers by each
+        # step; path_planner builds that too, off the frame loop.
+        path_planner.submit_field(maze)
+        bot_field = None
+        bot_waiting = True
+        return
+    bot_origin = current_origin()
+    cell, heading = bot_origin
+    path_planner.submit(selected_algorithm, cell, maze, rooms, heading=heading)
+    bot_commands = bot_pathfinding.CommandQueue()
+    bot_step = None
+    bot_waiting = True
+    bot_stats_logged = False
+
+def apply_maze_changes(changes):
+    """
+    Edits the maze while playing (changes: ((x, y), ch) pairs), relabels its
+    components and rebuilds the geometry. The bot asks for a new path (or
+    FIELD mode for a new exit distance field); in DSTAR mode the planner
+    worker repairs its previous search around the edited cells.
+    """
+    global maze_labels
+    maze_index.set_cells(changes)  # maze_index.maze is maze, so this edits it too
+    maze_labels, _ = nethack_map_generator.label_components(nethack_map_generator.maze_to_array(maze))
+    rebuild_geometry()
+    if bot_mode:
+        request_bot_path()
+
+def toggle_cell_ahead():
+    """Digs out the wall in front of the player, or walls up the open cell there."""
+    (x, y), heading = current_origin()
+    step_x, step_z = bot_pathfinding.HEADING_STEPS[heading]
+    x, y = x + step_x, y + step_z
+    # The outer border stays solid so nothing can walk off the map.
+    if not (0 < x < len(maze[0]) - 1 and 0 < y < len(maze) - 1):
+        return
+    ch = maze[y][x]
+    if ch in ('#', ' '):
+        new_ch = ' ' if ch == '#' else '#'
+        apply_maze_changes([((x, y), new_ch)])
+        print(f"Cell ({x}, {y}) {'dug out' if new_ch == ' ' else 'walled up'}")
+
 def draw_help(window_width, window_height):
     glDisable(GL_TEXTURE_2D)
     glDisable(GL_LIGHTING)
@@ -292,11 +508,22 @@ def draw_help(window_width, window_height):
         "2: Select DFS pathfinding",
         "3: Select A* pathfinding",
         "4: Select EXPLORE mode (visit all rooms then exit)",
+        "5: Select FIELD mode (steer by exit distance field)",
+        "6: Select JPS pathfinding (Jump Point Search)",
+        "7: Select HPA pathfinding (hierarchical room graph)",
+        "8: Select bidirectional BFS pathfinding",
+        "9: Select bidirectional A* pathfinding",
+        "0: Select D* Lite pathfinding (repairs its path when the maze changes)",
+        "T: Select TIMED pathfinding (fewest seconds, counting turns)",
         "H: Toggle help screen (always on at start)",
+        "G: Toggle greedy meshing (merged, indexed geometry)",
+        "X: Dig out / wall up the cell in front of you",
         "R: Reset game",
         "Esc: Exit game",
         "Mouse Button 1 + Drag (when full map open): Pan the map"
     ]
+    if last_search_stats is not None:
+        help_lines += ["", "Last bot search:"] + last_search_stats.summary()
     x = 20
     y = window_height - 20
     glColor3f(1, 1, 1)
@@ -491,57 +718,58 @@ def is_collision(x, z):
     return maze[maze_z][maze_x] in ('#', 'B')
 
 def main():
-    global maze, rooms, player_pos
+    global maze, rooms, maze_labels, maze_index, player_pos
     global player_angle_deg, is_moving, start_pos, target_pos, move_progress
     global is_turning, start_angle, target_angle, turn_progress, turn_duration
     global show_full_map, m_toggle_pressed, discovered
-    global bot_mode, b_toggle_pressed, selected_algorithm, bot_path, bot_path_index
-    global show_help, h_toggle_pressed, paused, p_toggle_pressed
+    global bot_mode, b_toggle_pressed, selected_algorithm, bot_commands, bot_step, bot_stats_logged
+    global show_help, h_toggle_pressed, paused, p_toggle_pressed, greedy_meshing, g_toggle_pressed
+    global x_toggle_pressed
     global full_map_offset_x, full_map_offset_y, full_map_panned
-    global unstuck_mode, unstuck_attempts
+    global unstuck_mode, unstuck_attempts, bot_waiting, last_search_stats, bot_field
 
     reset_requested = False
     exit_requested = False
 
-    # Generate a new random seed.
-    initial_seed = random.randint(1, 99)
-    print("Initial seed:", initial_seed)
-    maze, rooms = nethack_map_generator.create_map(
-        width=100,
-        height=100,
-        max_rooms=40,
-        room_min_size=3,
-        room_max_size=7,
-        seed=initial_seed
-    )
+    # Generate a new random seed. A level whose rooms cannot reach the exit
+    # fails the solvability check and is replaced by the next seed's.
+    seed = random.getrandbits(32)
+    while True:
+        print("Seed:", seed)
+        # A cache hit maps the grid and its component labels straight from disk.
+        maze_grid, rooms, maze_labels = level_cache.load_map(
+            width=100,
+            height=100,
+            max_rooms=40,
+            room_min_size=3,
+            room_max_size=7,
+            seed=seed,
+            as_array=True,
+            with_labels=True
+        )
+        maze = nethack_map_generator.array_to_maze(maze_grid)  # One string per row
+        # Lazy: neighbour tuples are worked out only for the cells a search visits.
+        maze_index = bot_pathfinding.MazeIndex(maze, lazy=True)
+        exit_cell = maze_index.exit_cell
+        exit_label = maze_labels[exit_cell[1], exit_cell[0]] if exit_cell is not None else 0
+        spawn = choose_spawn(rooms, maze_labels, exit_label)
+        if spawn is not None and exit_label and maze_labels[spawn[1], spawn[0]] == exit_label:
+            break
+        print(f"Seed {seed}: no room is connected to the exit, trying the next seed.")
+        seed = (seed + 1) % 2**32
+    path_planner.cancel()  # A path for the previous maze may still be on its way.
+    bot_waiting = False
+    bot_commands = bot_pathfinding.CommandQueue()
+    bot_step = None
+    bot_field = None
+    last_search_stats = None
     for row in maze[:5]:
         print(row)
     
     rows = len(maze)
     cols = len(maze[0])
-    discovered = [[False for _ in range(cols)] for _ in range(rows)]
-    
-    # Spawn the player inside a room.
-    if rooms:
-        candidate_rooms = rooms[:-1] if len(rooms) > 1 else rooms
-        chosen_room = random.choice(candidate_rooms)
-        # Use interior candidates if room is large enough (to avoid walls).
-        if (chosen_room.x2 - chosen_room.x1) > 2 and (chosen_room.y2 - chosen_room.y1) > 2:
-            inner_candidates = [
-                (chosen_room.x1 + 1, chosen_room.y1 + 1),
-                (chosen_room.x2 - 2, chosen_room.y1 + 1),
-                (chosen_room.x1 + 1, chosen_room.y2 - 2),
-                (chosen_room.x2 - 2, chosen_room.y2 - 2)
-            ]
-            spawn_x, spawn_y = random.choice(inner_candidates)
-        else:
-            spawn_x, spawn_y = chosen_room.center
-    else:
-        spawn_x, spawn_y = (cols // 2, rows // 2)
-    
-    # Ensure the spawn is not in a wall or black cell.
-    if maze[spawn_y][spawn_x] not in (' ', 'E'):
-        spawn_x, spawn_y = find_nearest_floor(spawn_x, spawn_y, maze)
+    discovered = [bytearray(cols) for _ in range(rows)]
+    spawn_x, spawn_y = spawn
     
     # Set player position at the center of the spawn cell.
     player_pos = glm.vec3(spawn_x + 0.5, 0.0, spawn_y + 0.5)
@@ -572,18 +800,8 @@ def main():
     rebuild_geometry()
     
     if bot_mode:
-        print("Bot mode is enabled. Pausing for 3 seconds before resuming bot pathfinding...")
-        time.sleep(3)
-        if selected_algorithm == "bfs":
-            bot_path = bot_pathfinding.find_exit_bfs(player_pos, maze)
-        elif selected_algorithm == "dfs":
-            bot_path = bot_pathfinding.find_exit_dfs(player_pos, maze)
-        elif selected_algorithm == "astar":
-            bot_path = bot_pathfinding.find_exit_astar(player_pos, maze)
-        elif selected_algorithm == "explore":
-            bot_path = bot_pathfinding.find_exit_explore(player_pos, maze, rooms)
-        bot_path_index = 0
-        print("Bot mode resumed.")
+        request_bot_path()
+        print("Bot mode is enabled, planning a path.")
     
     glfw.set_mouse_button_callback(window, mouse_button_callback)
     glfw.set_cursor_pos_callback(window, cursor_position_callback)
@@ -648,6 +866,21 @@ def main():
         else:
             h_toggle_pressed = False
 
+        if glfw.get_key(window, glfw.KEY_G) == glfw.PRESS:
+            if not g_toggle_pressed:
+                greedy_meshing = not greedy_meshing
+                g_toggle_pressed = True
+                rebuild_geometry()
+        else:
+            g_toggle_pressed = False
+
+        if glfw.get_key(window, glfw.KEY_X) == glfw.PRESS:
+            if not x_toggle_pressed and not is_moving and not is_turning:
+                toggle_cell_ahead()
+                x_toggle_pressed = True
+        else:
+            x_toggle_pressed = False
+
         if glfw.get_key(window, glfw.KEY_R) == glfw.PRESS:
             if not reset_requested:
                 print("Resetting game...")
@@ -660,19 +893,15 @@ def main():
                 b_toggle_pressed = True
                 print("Bot mode", "enabled" if bot_mode else "disabled")
                 if bot_mode:
-                    if selected_algorithm == "bfs":
-                        bot_path = bot_pathfinding.find_exit_bfs(player_pos, maze)
-                    elif selected_algorithm == "dfs":
-                        bot_path = bot_pathfinding.find_exit_dfs(player_pos, maze)
-                    elif selected_algorithm == "astar":
-                        bot_path = bot_pathfinding.find_exit_astar(player_pos, maze)
-                    elif selected_algorithm == "explore":
-                        bot_path = bot_pathfinding.find_exit_explore(player_pos, maze, rooms)
-                    bot_path_index = 0
+                    request_bot_path()
                     print(f"Pathfinding algorithm: {selected_algorithm.upper()}")
+                else:
+                    path_planner.cancel()
+                    bot_waiting = False
         else:
             b_toggle_pressed = False
 
+        previous_algorithm = selected_algorithm
         if glfw.get_key(window, glfw.KEY_1) == glfw.PRESS:
             selected_algorithm = "bfs"
             print("Algorithm selected: BFS")
@@ -685,12 +914,71 @@ def main():
         elif glfw.get_key(window, glfw.KEY_4) == glfw.PRESS:
             selected_algorithm = "explore"
             print("Algorithm selected: EXPLORE (visit all rooms then exit)")
+        elif glfw.get_key(window, glfw.KEY_5) == glfw.PRESS:
+            selected_algorithm = "field"
+            print("Algorithm selected: FIELD (steer by exit distance field)")
+        elif glfw.get_key(window, glfw.KEY_6) == glfw.PRESS:
+            selected_algorithm = "jps"
+            print("Algorithm selected: JPS (Jump Point Search)")
+        elif glfw.get_key(window, glfw.KEY_7) == glfw.PRESS:
+            selected_algorithm = "hpa"
+            print("Algorithm selected: HPA (hierarchical room graph)")
+        elif glfw.get_key(window, glfw.KEY_8) == glfw.PRESS:
+            selected_algorithm = "bibfs"
+            print("Algorithm selected: Bidirectional BFS")
+        elif glfw.get_key(window, glfw.KEY_9) == glfw.PRESS:
+            selected_algorithm = "biastar"
+            print("Algorithm selected: Bidirectional A*")
+        elif glfw.get_key(window, glfw.KEY_0) == glfw.PRESS:
+            selected_algorithm = "dstar"
+            print("Algorithm selected: D* Lite")
+        elif glfw.get_key(window, glfw.KEY_T) == glfw.PRESS:
+            selected_algorithm = "timed"
+            print("Algorithm selected: TIMED (fewest seconds, counting turns)")
+        if bot_mode and selected_algorithm != previous_algorithm:
+            request_bot_path()  # Replan with the new algorithm (FIELD only fetches the field).
 
         current_angle = glm.mix(start_angle, target_angle, turn_progress if is_turning else 1.0)
         direction = glm.vec2(np.sin(np.radians(current_angle)), np.cos(np.radians(current_angle)))
 
+        if path_planner.pending():
+            chunks = path_planner.poll()
+            if chunks and selected_algorithm == "field":
+                bot_field = chunks[-1]
+                bot_waiting = False
+            elif chunks and bot_waiting and current_origin() != bot_origin:
+                request_bot_path()  # The player moved or turned while it was being planned.
+            elif chunks:
+                for commands in chunks:
+                    bot_commands.extend(commands)
+                bot_waiting = False
+                if not path_planner.pending():
+                    last_search_stats = path_planner.stats
+                    hits, suffix_hits, misses = path_planner.cache_counters
+                    print(f"Bot path ready: {last_search_stats.path_length} steps in {bot_commands.received} commands. "
+                          f"Path cache: {hits} hits, {suffix_hits} suffix hits, {misses} misses")
+
         if not is_moving and not is_turning:
-            if bot_mode and bot_path_index < len(bot_path):
+            # What the bot does next: FIELD mode looks up the next cell in the
+            # exit distance field each step, the other modes take the next
+            # command from the stream planned in the background (nothing until
+            # the field or the first chunk has arrived).
+            bot_next_cell = None
+            bot_command = None
+            if bot_mode and not bot_waiting:
+                if selected_algorithm != "field":
+                    if bot_step is None:
+                        bot_step = bot_commands.next_command()
+                        if (bot_step is None and not path_planner.pending()
+                                and last_search_stats is not None and not bot_stats_logged):
+                            for line in last_search_stats.summary():
+                                print(line)
+                            bot_stats_logged = True
+                    bot_command = bot_step
+                elif bot_field is not None:
+                    bot_next_cell = bot_pathfinding.next_step_to_exit(
+                        (int(player_pos.x), int(player_pos.z)), maze_index, bot_field)
+            if bot_next_cell is not None or bot_command is not None:
                 current_cell = (int(player_pos.x), int(player_pos.z))
                 if maze[current_cell[1]][current_cell[0]] in ('#', 'B'):
                     if not unstuck_mode:
@@ -720,19 +1008,28 @@ def main():
                                 player_angle_deg = target_angle
                         unstuck_attempts += 1
                         if unstuck_attempts > 4:
-                            if selected_algorithm == "bfs":
-                                bot_path = bot_pathfinding.find_exit_bfs(player_pos, maze)
-                            elif selected_algorithm == "dfs":
-                                bot_path = bot_pathfinding.find_exit_dfs(player_pos, maze)
-                            elif selected_algorithm == "astar":
-                                bot_path = bot_pathfinding.find_exit_astar(player_pos, maze)
-                            elif selected_algorithm == "explore":
-                                bot_path = bot_pathfinding.find_exit_explore(player_pos, maze, rooms)
-                            bot_path_index = 0
+                            request_bot_path()
                             unstuck_mode = False
+                elif bot_command == bot_pathfinding.FORWARD:
+                    unstuck_mode = False
+                    step_x, step_z = bot_pathfinding.HEADING_STEPS[round(player_angle_deg / 90) % 4]
+                    start_pos = glm.vec3(player_pos)
+                    # Aim at the next cell's centre, so the bot never drifts off the grid.
+                    target_pos = glm.vec3(int(player_pos.x) + step_x + 0.5, 0.0, int(player_pos.z) + step_z + 0.5)
+                    move_progress = 0.0
+                    is_moving = True
+                    bot_step = None
+                elif bot_command is not None:
+                    unstuck_mode = False
+                    start_angle = player_angle_deg
+                    target_angle = (player_angle_deg + bot_pathfinding.TURN_ANGLES[bot_command]) % 360
+                    turn_progress = 0.0
+                    is_turning = True
+                    player_angle_deg = target_angle
+                    bot_step = None
                 else:
                     unstuck_mode = False
-                    next_x, next_z = bot_path[bot_path_index]
+                    next_x, next_z = bot_next_cell
                     dx = (next_x + 0.5) - player_pos.x
                     dz = (next_z + 0.5) - player_pos.z
                     raw_angle = math.degrees(math.atan2(dx, dz)) % 360
@@ -749,8 +1046,8 @@ def main():
                         target_pos = glm.vec3(next_x + 0.5, 0.0, next_z + 0.5)
                         move_progress = 0.0
                         is_moving = True
-                        bot_path_index += 1
-            else:
+            elif bot_waiting or not path_planner.pending():
+                # Manual control, except while the bot waits on the rest of a path it has started.
                 if glfw.get_key(window, glfw.KEY_W):
                     next_pos = player_pos + glm.vec3(direction.x, 0, direction.y)
                     if not is_collision(next_pos.x, next_pos.z):
@@ -867,49 +1164,10 @@ def main():
         glEnd()
         glColor3f(1, 1, 1)
         
-        glBindTexture(GL_TEXTURE_2D, ground_tex)
-        glBindBuffer(GL_ARRAY_BUFFER, floor_vbo)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(3, GL_FLOAT, 5*4, ctypes.c_void_p(0))
-        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-        glTexCoordPointer(2, GL_FLOAT, 5*4, ctypes.c_void_p(3*4))
-        glDrawArrays(GL_TRIANGLES, 0, floor_vertex_count)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        
-        glBindTexture(GL_TEXTURE_2D, roof_tex)
-        glBindBuffer(GL_ARRAY_BUFFER, ceiling_vbo)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(3, GL_FLOAT, 5*4, ctypes.c_void_p(0))
-        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-        glTexCoordPointer(2, GL_FLOAT, 5*4, ctypes.c_void_p(3*4))
-        glDrawArrays(GL_TRIANGLES, 0, ceiling_vertex_count)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        
-        glBindTexture(GL_TEXTURE_2D, brick_tex)
-        glBindBuffer(GL_ARRAY_BUFFER, wall_brick_vbo)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(3, GL_FLOAT, 5*4, ctypes.c_void_p(0))
-        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-        glTexCoordPointer(2, GL_FLOAT, 5*4, ctypes.c_void_p(3*4))
-        glDrawArrays(GL_TRIANGLES, 0, wall_brick_vertex_count)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        
-        glBindTexture(GL_TEXTURE_2D, exit_tex)
-        glBindBuffer(GL_ARRAY_BUFFER, wall_exit_vbo)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(3, GL_FLOAT, 5*4, ctypes.c_void_p(0))
-        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-        glTexCoordPointer(2, GL_FLOAT, 5*4, ctypes.c_void_p(3*4))
-        glDrawArrays(GL_TRIANGLES, 0, wall_exit_vertex_count)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        draw_mesh(ground_tex, floor_vbo, floor_vertex_count, floor_ibo, floor_index_count)
+        draw_mesh(roof_tex, ceiling_vbo, ceiling_vertex_count, ceiling_ibo, ceiling_index_count)
+        draw_mesh(brick_tex, wall_brick_vbo, wall_brick_vertex_count, wall_brick_ibo, wall_brick_index_count)
+        draw_mesh(exit_tex, wall_exit_vbo, wall_exit_vertex_count, wall_exit_ibo, wall_exit_index_count)
         
         glEnable(GL_LIGHTING)
         
@@ -944,3 +1202,4 @@ if __name__ == "__main__":
             continue
         else:
             break
+    path_planner.shutdown()